@@ -7,12 +7,196 @@ for leaf images, analyzing color, texture, shape, and health indicators.
 """
 
 import cv2
+import logging
 import numpy as np
-from typing import Dict, Tuple, Optional
-from PIL import Image
-import base64
-import io
+import os
+import re
+from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
 
+# pybase64 decodes with SIMD when installed; the stdlib API is identical
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+logger = logging.getLogger(__name__)
+
+
+# Inclusive HSV ranges counted over the whole image: (name, lower, upper)
+_IMAGE_HSV_RANGES = (
+    ("yellowing", (20, 50, 100), (30, 255, 255)),
+    ("pale", (0, 0, 0), (255, 50, 255)),
+    ("dark_green", (40, 100, 0), (80, 255, 100)),
+    ("brown", (10, 50, 20), (25, 255, 150)),
+    ("white", (0, 0, 200), (180, 30, 255)),
+    ("black", (0, 0, 0), (255, 255, 50)),
+    ("yellow", (20, 100, 100), (30, 255, 255)),
+    ("green", (40, 50, 0), (80, 255, 150)),
+    ("vegetation", (10, 40, 30), (90, 255, 255)),  # brown through yellow to green
+)
+
+# Inclusive HSV ranges counted over the image border (leaf margins)
+_EDGE_HSV_RANGES = (
+    ("burnt", (0, 0, 0), (180, 255, 79)),
+    ("yellow", (20, 100, 100), (30, 255, 255)),
+    ("dry", (0, 0, 101), (180, 49, 199)),
+)
+
+
+def _compile_hsv_ranges(thresholds_lo: np.ndarray,
+                        thresholds_hi: np.ndarray) -> Tuple[np.ndarray, list, list]:
+    """
+    Precompute the quantization LUT, histogram bins and per-range boxes.
+    
+    Each channel is quantized into the bins delimited by the range
+    bounds (np.searchsorted builds the lookup table); every range then
+    maps to one box of the resulting 3D histogram.
+    """
+    luts = [np.searchsorted(np.union1d(thresholds_lo[:, c], thresholds_hi[:, c] + 1),
+                            np.arange(256), side='right')
+            for c in range(3)]
+    
+    lut = np.stack(luts, axis=-1).astype(np.uint8).reshape(256, 1, 3)
+    bins = [int(channel_lut[-1]) + 1 for channel_lut in luts]
+    boxes = [tuple(slice(int(luts[c][lo[c]]), int(luts[c][min(hi[c], 255)]) + 1)
+                   for c in range(3))
+             for lo, hi in zip(thresholds_lo, thresholds_hi)]
+    return lut, bins, boxes
+
+
+def _count_compiled(hsv: np.ndarray, compiled: Tuple[np.ndarray, list, list]) -> np.ndarray:
+    """Count the pixels of each range of a precompiled table in one histogram pass."""
+    lut, bins, boxes = compiled
+    hist = cv2.calcHist([cv2.LUT(hsv, lut)], [0, 1, 2], None, bins,
+                        [0, bins[0], 0, bins[1], 0, bins[2]])
+    return np.array([hist[box].sum() for box in boxes], dtype=np.int64)
+
+
+def hsv_range_counts(hsv: np.ndarray, thresholds_lo: np.ndarray,
+                     thresholds_hi: np.ndarray) -> np.ndarray:
+    """
+    Count the pixels inside each inclusive HSV range in a single pass.
+    
+    One 3D histogram of the quantized image answers every range query
+    instead of running a cv2.inRange + countNonZero per range.
+    
+    Args:
+        hsv: HSV image (uint8, 3 channels)
+        thresholds_lo: (N, 3) lower bounds, one row per range
+        thresholds_hi: (N, 3) upper bounds, one row per range
+        
+    Returns:
+        (N,) array with the pixel count of each range
+    """
+    return _count_compiled(hsv, _compile_hsv_ranges(thresholds_lo, thresholds_hi))
+
+
+def _range_table(ranges: Tuple) -> Tuple[Tuple, Tuple[np.ndarray, list, list]]:
+    """Split (name, lower, upper) rows into names and the compiled range table."""
+    names, lows, highs = zip(*ranges)
+    return names, _compile_hsv_ranges(np.array(lows, dtype=np.int32),
+                                      np.array(highs, dtype=np.int32))
+
+
+def _local_variance(channel: np.ndarray, ksize: int) -> np.ndarray:
+    """
+    Windowed variance E[X^2] - E[X]^2 over a ksize x ksize box.
+    
+    boxFilter and sqrBoxFilter read the uint8 channel directly into
+    float32 sums, so no float copy or squared image is materialized.
+    """
+    local_mean = cv2.boxFilter(channel, cv2.CV_32F, (ksize, ksize))
+    local_var = cv2.sqrBoxFilter(channel, cv2.CV_32F, (ksize, ksize))
+    local_var -= local_mean * local_mean
+    return local_var
+
+
+# Range tables compiled once at import time
+_IMAGE_HSV_NAMES, _IMAGE_HSV_TABLE = _range_table(_IMAGE_HSV_RANGES)
+_EDGE_HSV_NAMES, _EDGE_HSV_TABLE = _range_table(_EDGE_HSV_RANGES)
+
+
+def detect_image_format(data: bytes) -> Optional[str]:
+    """
+    Identify an encoded image from its leading magic bytes.
+    
+    Common formats are recognized without decoding. Anything else is
+    handed to cv2.imdecode at 1/8 scale, so every format OpenCV can read
+    (PPM, JPEG 2000, ...) stays accepted; non-images fail that probe
+    quickly on their signature.
+    
+    Returns:
+        'jpeg', 'png', 'webp', 'bmp', 'tiff' or 'gif', 'other' for any
+        other format OpenCV decodes, or None for anything else
+    """
+    head = bytes(data[:12])
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if data and cv2.imdecode(np.frombuffer(data, dtype=np.uint8),
+                             cv2.IMREAD_REDUCED_GRAYSCALE_8) is not None:
+        return 'other'
+    return None
+
+
+# ASCII whitespace, e.g. the line breaks of MIME/PEM-wrapped base64
+_B64_WS_RE = re.compile(r'[ \t\n\r\v\f]')
+
+
+def normalize_base64(data: str) -> str:
+    """
+    Strip a data URL prefix and any whitespace from base64 image data.
+    
+    Line-wrapped base64 (76-column MIME output of `base64` or
+    `openssl base64`) is unwrapped; unwrapped input is returned without
+    being copied.
+    """
+    if data.startswith('data:'):
+        data = data[data.find(',') + 1:]
+    if _B64_WS_RE.search(data):
+        data = _B64_WS_RE.sub('', data)
+    return data
+
+
+def decode_base64_image(data: str) -> bytes:
+    """
+    Strictly decode cleaned base64 image data, failing fast on bad input.
+    
+    The decode doubles as validation (alphabet and padding), so garbage
+    is rejected before any CV work or API call.
+    
+    Args:
+        data: Base64 image data as returned by normalize_base64
+        
+    Returns:
+        The decoded image file contents
+        
+    Raises:
+        ValueError: If the data is not valid base64 or not a supported image
+    """
+    # Padded base64 always comes in 4-character groups; reject other
+    # lengths before the decoder scans the whole string
+    if len(data) % 4:
+        raise ValueError("not valid base64 data: length is not a multiple of 4")
+    
+    try:
+        image_bytes = base64.b64decode(data, validate=True)
+    except ValueError as e:
+        raise ValueError(f"not valid base64 data: {e}")
+    
+    if detect_image_format(image_bytes) is None:
+        raise ValueError("not a supported image; expected JPEG, PNG, WebP, BMP, TIFF or GIF")
+    return image_bytes
 
 class LeafImageAnalyzer:
     """
@@ -33,6 +217,16 @@ class LeafImageAnalyzer:
     - pH Proxy
     """
     
+    # Long side (in pixels) that percentage-based features are computed at
+    ANALYSIS_MAX_SIDE = 512
+    
+    # Weight of each stress flag built in calculate_stress_score (lesions
+    # are more serious and count double)
+    STRESS_WEIGHTS = np.array([1, 1, 1, 2, 1, 1, 1, 1, 1], dtype=np.int8)
+    
+    # Quality used when re-encoding non-JPEG uploads for the model payload
+    JPEG_QUALITY = 85
+    
     def __init__(self):
         """Initialize the leaf image analyzer."""
         pass
@@ -41,27 +235,115 @@ class LeafImageAnalyzer:
         """Convert base64 string to OpenCV image."""
         try:
             # Remove data URL prefix if present
-            if ',' in base64_string:
-                base64_string = base64_string.split(',')[1]
-            
-            # Decode base64
-            image_data = base64.b64decode(base64_string)
-            image = Image.open(io.BytesIO(image_data))
+            comma = base64_string.find(',')
+            if comma != -1:
+                base64_string = base64_string[comma + 1:]
             
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Convert to numpy array (OpenCV format)
-            img_array = np.array(image)
-            # Convert RGB to BGR for OpenCV
-            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            
-            return img_array
+            return self.bytes_to_image(base64.b64decode(base64_string))
         except Exception as e:
             raise ValueError(f"Failed to decode base64 image: {str(e)}")
     
-    def extract_leaf_color_features(self, img: np.ndarray) -> Dict:
+    def bytes_to_image(self, image_bytes: bytes) -> np.ndarray:
+        """Convert encoded image bytes (JPEG, PNG, ...) to OpenCV image."""
+        # View the bytes as a uint8 buffer (no copy)
+        buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+        
+        # Decode straight into a 3-channel BGR array (OpenCV format)
+        img_array = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if img_array is None:
+            raise ValueError("unsupported or corrupt image data")
+        
+        return img_array
+    
+    def to_jpeg_bytes(self, image_bytes: bytes) -> bytes:
+        """
+        Return the image as JPEG bytes, re-encoding only non-JPEG input.
+        
+        JPEG data is passed through untouched (re-encoding would only lose
+        quality); PNG/BMP/TIFF/GIF uploads are decoded and re-encoded at
+        JPEG_QUALITY, which shrinks them several-fold.
+        """
+        if detect_image_format(image_bytes) == 'jpeg':
+            return image_bytes
+        
+        ok, encoded = cv2.imencode('.jpg', self.bytes_to_image(image_bytes),
+                                   (cv2.IMWRITE_JPEG_QUALITY, self.JPEG_QUALITY))
+        if not ok:
+            raise ValueError("failed to re-encode image as JPEG")
+        
+        return encoded.tobytes()
+    
+    def _prepare(self, img: np.ndarray) -> Dict:
+        """
+        Compute the color spaces and channels shared by the extractors.
+        
+        Each conversion is done once per image so the extract_* methods
+        can read from the returned context instead of re-running
+        cvtColor themselves.
+        
+        Percentage-based features are scale invariant, so they run on a
+        copy downscaled to ANALYSIS_MAX_SIDE. Only the contour geometry
+        used by the shape and size extractors keeps full resolution.
+        """
+        full_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        
+        # Leaf contour shared by the shape and size extractors; an empty
+        # Otsu mask has no contours, so skip findContours for it
+        _, binary = cv2.threshold(full_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        leaf_pixels = cv2.countNonZero(binary)
+        if leaf_pixels:
+            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        else:
+            contours = ()
+        if contours:
+            # Largest contour is assumed to be the leaf
+            largest_contour = max(contours, key=cv2.contourArea)
+            leaf_area = cv2.contourArea(largest_contour)
+            leaf_perimeter = cv2.arcLength(largest_contour, True)
+        else:
+            largest_contour = None
+            leaf_area = 0.0
+            leaf_perimeter = 0.0
+        
+        scale = self.ANALYSIS_MAX_SIDE / max(img.shape[:2])
+        if scale < 1:
+            img = cv2.resize(img, None, fx=scale, fy=scale,
+                             interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = full_gray
+        
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+        
+        # Gray-level gradients shared by the texture and vein extractors
+        grad_x = cv2.Scharr(gray, cv2.CV_16S, 1, 0)
+        grad_y = cv2.Scharr(gray, cv2.CV_16S, 0, 1)
+        
+        # Per-channel means from one SIMD sum over the interleaved buffer
+        pixel_count = img.shape[0] * img.shape[1]
+        sum_b, sum_g, sum_r, _ = cv2.sumElems(img)
+        mean_b, mean_g, mean_r = sum_b / pixel_count, sum_g / pixel_count, sum_r / pixel_count
+        
+        # Pixel counts of every HSV range the extractors use
+        hsv_counts = dict(zip(_IMAGE_HSV_NAMES, _count_compiled(hsv, _IMAGE_HSV_TABLE)))
+        
+        return {
+            "bgr": img, "hsv": hsv, "gray": gray, "lab": lab,
+            "full_gray": full_gray,
+            "grad_x": grad_x, "grad_y": grad_y,
+            "largest_contour": largest_contour,
+            "leaf_area": leaf_area, "leaf_perimeter": leaf_perimeter,
+            # Channel views (no copies, unlike cv2.split)
+            "h": hsv[..., 0], "s": hsv[..., 1], "v": hsv[..., 2],
+            "mean_b": mean_b, "mean_g": mean_g, "mean_r": mean_r,
+            "L": lab[..., 0], "A": lab[..., 1], "B": lab[..., 2],
+            "hsv_counts": hsv_counts,
+            # Converts a pixel count into a percentage of the image
+            "inv_area_pct": 100.0 / pixel_count
+        }
+    
+    def extract_leaf_color_features(self, ctx: Dict) -> Dict:
         """
         Extract leaf color features (Feature #1 - Most Important).
         
@@ -71,28 +353,25 @@ class LeafImageAnalyzer:
         - Pale color (iron deficiency)
         - Dark green (excess nitrogen)
         """
-        # Convert to HSV for better color analysis
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Extract color channels
-        b, g, r = cv2.split(img)
-        h, s, v = cv2.split(hsv)
+        inv_area_pct = ctx["inv_area_pct"]
+        mean_b, mean_g, mean_r = ctx["mean_b"], ctx["mean_g"], ctx["mean_r"]
+        counts = ctx["hsv_counts"]
         
         # Calculate green intensity (chlorophyll proxy)
-        green_intensity = np.mean(g)
-        green_ratio = np.mean(g) / (np.mean(r) + np.mean(b) + 1)
+        green_intensity = mean_g
+        green_ratio = mean_g / (mean_r + mean_b + 1)
         
         # Detect yellowing (low saturation, medium-high value in yellow range)
-        yellow_mask = cv2.inRange(hsv, (20, 50, 100), (30, 255, 255))
-        yellowing_percentage = np.sum(yellow_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        yellowing_percentage = counts["yellowing"] * inv_area_pct
         
         # Detect pale color (low saturation)
-        pale_mask = cv2.inRange(s, 0, 50)
-        pale_percentage = np.sum(pale_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        pale_percentage = counts["pale"] * inv_area_pct
         
         # Detect dark green (high green, low value)
-        dark_green_mask = cv2.inRange(hsv, (40, 100, 0), (80, 255, 100))
-        dark_green_percentage = np.sum(dark_green_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        dark_green_percentage = counts["dark_green"] * inv_area_pct
+        
+        # Share of plant-coloured pixels (healthy or diseased tissue)
+        vegetation_percentage = counts["vegetation"] * inv_area_pct
         
         # Overall color health assessment
         if green_intensity > 100 and yellowing_percentage < 10 and pale_percentage < 20:
@@ -112,6 +391,7 @@ class LeafImageAnalyzer:
             "yellowing_percentage": float(yellowing_percentage),
             "pale_percentage": float(pale_percentage),
             "dark_green_percentage": float(dark_green_percentage),
+            "vegetation_percentage": float(vegetation_percentage),
             "color_status": color_status,
             "assessment": self._assess_color_health(green_intensity, yellowing_percentage, pale_percentage)
         }
@@ -125,32 +405,28 @@ class LeafImageAnalyzer:
         else:
             return "Moderate Health"
     
-    def extract_color_uniformity(self, img: np.ndarray) -> Dict:
+    def extract_color_uniformity(self, ctx: Dict) -> Dict:
         """
         Extract color uniformity features (Feature #2).
         
         Checks if leaf color is evenly distributed.
         """
-        # Convert to LAB color space for better uniformity analysis
-        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
+        # LAB lightness channel for better uniformity analysis
+        l, inv_area_pct = ctx["L"], ctx["inv_area_pct"]
         
-        # Calculate standard deviation (higher = less uniform)
-        l_std = np.std(l)
-        a_std = np.std(a)
-        b_std = np.std(b)
+        # Calculate mean and standard deviation (higher = less uniform),
+        # read from the interleaved LAB image to avoid copying the L view
+        mean, std = cv2.meanStdDev(ctx["lab"])
+        l_mean, l_std = float(mean[0, 0]), float(std[0, 0])
         
         # Calculate coefficient of variation
-        l_mean = np.mean(l)
         l_cv = (l_std / (l_mean + 1)) * 100
         
-        # Detect patchy areas (high local variance)
-        kernel = np.ones((15, 15), np.float32) / 225
-        local_mean = cv2.filter2D(l.astype(np.float32), -1, kernel)
-        local_var = cv2.filter2D((l.astype(np.float32) - local_mean) ** 2, -1, kernel)
+        # Detect patchy areas (high local variance, E[X^2] - E[X]^2)
+        local_var = _local_variance(l, 15)
         patchy_threshold = np.percentile(local_var, 90)
         patchy_mask = local_var > patchy_threshold
-        patchiness_percentage = np.sum(patchy_mask) / (img.shape[0] * img.shape[1]) * 100
+        patchiness_percentage = np.count_nonzero(patchy_mask) * inv_area_pct
         
         # Assess uniformity
         if l_cv < 15 and patchiness_percentage < 10:
@@ -167,35 +443,36 @@ class LeafImageAnalyzer:
             "is_uniform": l_cv < 20 and patchiness_percentage < 15
         }
     
-    def extract_texture_features(self, img: np.ndarray) -> Dict:
+    def extract_texture_features(self, ctx: Dict) -> Dict:
         """
         Extract texture features (Feature #3).
         
         Analyzes surface patterns using contrast, entropy, and edge detection.
         """
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray, inv_area_pct = ctx["gray"], ctx["inv_area_pct"]
         
         # Calculate texture features using GLCM-like approach
         # Contrast (local variance)
         kernel = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
         edges = cv2.filter2D(gray, -1, kernel)
-        contrast = np.std(edges)
+        contrast = float(cv2.meanStdDev(edges)[1][0, 0])
         
-        # Entropy (texture randomness)
+        # Entropy (texture randomness) over the non-empty histogram bins
         hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
-        hist = hist / (hist.sum() + 1e-10)
-        entropy = -np.sum(hist * np.log2(hist + 1e-10))
+        p = hist[hist > 0]
+        p /= p.sum()
+        entropy = -np.dot(p, np.log2(p))
         
-        # Edge density
-        edges_canny = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges_canny > 0) / (img.shape[0] * img.shape[1]) * 100
+        # Edge density (Canny on the shared Scharr gradients; thresholds
+        # are 4x the usual 50/150 to match Scharr's gain over Sobel)
+        edges_canny = cv2.Canny(ctx["grad_x"], ctx["grad_y"], 200, 600)
+        edge_density = cv2.countNonZero(edges_canny) * inv_area_pct
         
         # Detect rough/spotted areas
         # High contrast areas indicate texture abnormalities
         rough_threshold = np.percentile(edges, 90)
         rough_mask = edges > rough_threshold
-        roughness_percentage = np.sum(rough_mask) / (img.shape[0] * img.shape[1]) * 100
+        roughness_percentage = np.count_nonzero(rough_mask) * inv_area_pct
         
         # Assess texture
         if contrast < 20 and entropy < 6 and roughness_percentage < 5:
@@ -214,32 +491,25 @@ class LeafImageAnalyzer:
             "is_smooth": contrast < 25 and roughness_percentage < 10
         }
     
-    def extract_spots_lesions(self, img: np.ndarray) -> Dict:
+    def extract_spots_lesions(self, ctx: Dict) -> Dict:
         """
         Extract spots, lesions, and discoloration (Feature #4).
         
         Detects brown spots, white patches, black lesions, yellow margins.
         """
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        h, s, v = cv2.split(hsv)
+        counts, inv_area_pct = ctx["hsv_counts"], ctx["inv_area_pct"]
         
         # Detect brown spots (low value, medium saturation, brown hue)
-        brown_lower = np.array([10, 50, 20])
-        brown_upper = np.array([25, 255, 150])
-        brown_mask = cv2.inRange(hsv, brown_lower, brown_upper)
-        brown_percentage = np.sum(brown_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        brown_percentage = counts["brown"] * inv_area_pct
         
         # Detect white patches (high value, low saturation)
-        white_mask = cv2.inRange(hsv, (0, 0, 200), (180, 30, 255))
-        white_percentage = np.sum(white_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        white_percentage = counts["white"] * inv_area_pct
         
         # Detect black lesions (very low value)
-        black_mask = cv2.inRange(v, 0, 50)
-        black_percentage = np.sum(black_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        black_percentage = counts["black"] * inv_area_pct
         
         # Detect yellow margins/edges
-        yellow_mask = cv2.inRange(hsv, (20, 100, 100), (30, 255, 255))
-        yellow_percentage = np.sum(yellow_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        yellow_percentage = counts["yellow"] * inv_area_pct
         
         # Total abnormality percentage
         total_abnormal = brown_percentage + white_percentage + black_percentage
@@ -264,19 +534,15 @@ class LeafImageAnalyzer:
             "has_lesions": total_abnormal > 2
         }
     
-    def extract_shape_deformation(self, img: np.ndarray) -> Dict:
+    def extract_shape_deformation(self, ctx: Dict) -> Dict:
         """
         Extract shape and deformation features (Feature #5).
         
         Detects curling, folding, shrinking, twisting.
         """
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Find leaf contour
-        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        largest_contour = ctx["largest_contour"]
         
-        if not contours:
+        if largest_contour is None:
             return {
                 "shape_status": "Unable to Detect Shape",
                 "deformation_detected": False,
@@ -284,12 +550,9 @@ class LeafImageAnalyzer:
                 "compactness": 0.0
             }
         
-        # Get largest contour (assumed to be the leaf)
-        largest_contour = max(contours, key=cv2.contourArea)
-        
-        # Calculate shape metrics
-        area = cv2.contourArea(largest_contour)
-        perimeter = cv2.arcLength(largest_contour, True)
+        # Shape metrics of the leaf contour
+        area = ctx["leaf_area"]
+        perimeter = ctx["leaf_perimeter"]
         
         # Compactness (4π*area/perimeter²) - lower = more deformed
         if perimeter > 0:
@@ -298,23 +561,24 @@ class LeafImageAnalyzer:
             compactness = 0
         
         # Curvature analysis (detect curling/folding)
-        # Approximate contour to reduce noise
-        epsilon = 0.02 * cv2.arcLength(largest_contour, True)
-        approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-        
-        # Calculate convexity defects (indicates folding/curling)
-        hull = cv2.convexHull(largest_contour, returnPoints=False)
-        if len(hull) > 3:
-            defects = cv2.convexityDefects(largest_contour, hull)
-            if defects is not None:
-                defect_count = len(defects)
-                max_defect_depth = np.max(defects[:, 0, 3]) if len(defects) > 0 else 0
-            else:
-                defect_count = 0
-                max_defect_depth = 0
-        else:
-            defect_count = 0
-            max_defect_depth = 0
+        # Calculate convexity defects (indicates folding/curling); a very
+        # compact contour is strong evidence of no folding, so skip them
+        defect_count = 0
+        max_defect_depth = 0
+        if compactness <= 0.85:
+            hull = cv2.convexHull(largest_contour, returnPoints=False)
+            if len(hull) > 3:
+                try:
+                    defects = cv2.convexityDefects(largest_contour, hull)
+                except cv2.error:
+                    # Self-intersecting contours (common on noisy masks)
+                    # yield non-monotonic hull indices; score as no defects
+                    defects = None
+                if defects is not None and len(defects) > 0:
+                    # Defects are (N, 1, 4) on OpenCV 4.x and (N, 4) on 5.x
+                    depths = defects.reshape(-1, 4)[:, 3]
+                    defect_count = len(depths)
+                    max_defect_depth = np.max(depths)
         
         # Assess deformation
         if compactness > 0.7 and defect_count < 5:
@@ -332,42 +596,42 @@ class LeafImageAnalyzer:
             "defect_count": int(defect_count)
         }
     
-    def extract_edge_condition(self, img: np.ndarray) -> Dict:
+    def extract_edge_condition(self, ctx: Dict) -> Dict:
         """
         Extract leaf edge (margin) condition (Feature #6).
         
         Checks for burnt edges, yellow edges, dry margins.
         """
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        hsv = ctx["hsv"]
         
-        # Create edge mask (outer 10% of image)
-        h, w = gray.shape
-        mask = np.zeros((h, w), dtype=np.uint8)
+        # Edge region (outer 10% of image) as four non-overlapping strips;
+        # the interior is never touched
+        h, w = hsv.shape[:2]
         border_width = max(10, min(h, w) // 10)
-        mask[0:border_width, :] = 255  # Top
-        mask[h-border_width:h, :] = 255  # Bottom
-        mask[:, 0:border_width] = 255  # Left
-        mask[:, w-border_width:w] = 255  # Right
-        
-        # Analyze edge regions
-        edge_region = cv2.bitwise_and(gray, mask)
-        edge_hsv = cv2.bitwise_and(hsv, cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR))
+        bottom = max(border_width, h - border_width)
+        right = max(border_width, w - border_width)
+        strips = [
+            hsv[:border_width, :],  # Top
+            hsv[bottom:, :],  # Bottom
+            hsv[border_width:bottom, :border_width],  # Left
+            hsv[border_width:bottom, right:]  # Right
+        ]
+        
+        border_pixels = sum(strip.shape[0] * strip.shape[1] for strip in strips)
+        inv_border_pct = 100.0 / border_pixels if border_pixels > 0 else 0.0
+        
+        # Count all edge ranges in one pass per strip
+        edge_counts = dict(zip(_EDGE_HSV_NAMES, sum(_count_compiled(strip, _EDGE_HSV_TABLE)
+                                                    for strip in strips if strip.size)))
         
         # Detect burnt edges (dark brown/black at edges)
-        edge_v = cv2.split(edge_hsv)[2]
-        burnt_mask = edge_v < 80
-        burnt_percentage = np.sum(burnt_mask) / np.sum(mask > 0) * 100 if np.sum(mask > 0) > 0 else 0
+        burnt_percentage = edge_counts["burnt"] * inv_border_pct
         
         # Detect yellow edges
-        edge_h = cv2.split(edge_hsv)[0]
-        yellow_edge_mask = cv2.inRange(edge_hsv, (20, 100, 100), (30, 255, 255))
-        yellow_edge_percentage = np.sum(yellow_edge_mask > 0) / np.sum(mask > 0) * 100 if np.sum(mask > 0) > 0 else 0
+        yellow_edge_percentage = edge_counts["yellow"] * inv_border_pct
         
         # Detect dry margins (low saturation, medium value)
-        edge_s = cv2.split(edge_hsv)[1]
-        dry_mask = (edge_s < 50) & (edge_v > 100) & (edge_v < 200)
-        dry_percentage = np.sum(dry_mask) / np.sum(mask > 0) * 100 if np.sum(mask > 0) > 0 else 0
+        dry_percentage = edge_counts["dry"] * inv_border_pct
         
         # Assess edge condition
         if burnt_percentage < 5 and yellow_edge_percentage < 10 and dry_percentage < 15:
@@ -389,19 +653,15 @@ class LeafImageAnalyzer:
             "edge_issues_detected": burnt_percentage > 10 or yellow_edge_percentage > 15 or dry_percentage > 20
         }
     
-    def extract_size_area(self, img: np.ndarray) -> Dict:
+    def extract_size_area(self, ctx: Dict) -> Dict:
         """
         Extract leaf size and area features (Feature #7).
         
         Calculates leaf area and relative size.
         """
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = ctx["full_gray"]
         
-        # Find leaf contour
-        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if not contours:
+        if ctx["largest_contour"] is None:
             return {
                 "leaf_area_pixels": 0,
                 "leaf_area_percentage": 0.0,
@@ -409,9 +669,8 @@ class LeafImageAnalyzer:
                 "size_status": "Unable to Calculate"
             }
         
-        largest_contour = max(contours, key=cv2.contourArea)
-        leaf_area = cv2.contourArea(largest_contour)
-        total_image_area = img.shape[0] * img.shape[1]
+        leaf_area = ctx["leaf_area"]
+        total_image_area = gray.shape[0] * gray.shape[1]
         leaf_area_percentage = (leaf_area / total_image_area) * 100
         
         # Assess size (relative to image)
@@ -433,38 +692,34 @@ class LeafImageAnalyzer:
             "is_stunted": leaf_area_percentage < 30
         }
     
-    def extract_vein_visibility(self, img: np.ndarray) -> Dict:
+    def extract_vein_visibility(self, ctx: Dict) -> Dict:
         """
         Extract vein color and visibility (Feature #8).
         
         Detects green veins with yellow surface (iron deficiency),
         prominent veins (stress indicators).
         """
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        counts, inv_area_pct = ctx["hsv_counts"], ctx["inv_area_pct"]
         
-        # Detect veins using edge detection
-        # Veins appear as darker lines
-        edges = cv2.Canny(gray, 50, 150)
-        
-        # Use morphological operations to enhance vein detection
-        kernel = np.ones((3, 3), np.uint8)
-        veins_enhanced = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+        # Detect veins from the gradient magnitude
+        # Veins appear as darker lines with strong local gradients
+        # (Scharr responses are scaled by 1/4 to Sobel gain so they do
+        # not saturate in uint8)
+        grad_x = cv2.convertScaleAbs(ctx["grad_x"], alpha=0.25)
+        grad_y = cv2.convertScaleAbs(ctx["grad_y"], alpha=0.25)
+        magnitude = cv2.addWeighted(grad_x, 0.5, grad_y, 0.5, 0)
+        _, veins_enhanced = cv2.threshold(magnitude, 40, 255, cv2.THRESH_BINARY)
         
         # Calculate vein density
-        vein_density = np.sum(veins_enhanced > 0) / (img.shape[0] * img.shape[1]) * 100
+        vein_density = cv2.countNonZero(veins_enhanced) * inv_area_pct
         
         # Detect green veins (veins should be darker green)
         # Check if veins are green while surface is yellow
-        h, s, v = cv2.split(hsv)
-        
         # Green regions (veins typically darker green)
-        green_mask = cv2.inRange(hsv, (40, 50, 0), (80, 255, 150))
-        green_vein_percentage = np.sum(green_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        green_vein_percentage = counts["green"] * inv_area_pct
         
         # Yellow surface regions
-        yellow_mask = cv2.inRange(hsv, (20, 100, 100), (30, 255, 255))
-        yellow_surface_percentage = np.sum(yellow_mask > 0) / (img.shape[0] * img.shape[1]) * 100
+        yellow_surface_percentage = counts["yellow"] * inv_area_pct
         
         # Assess vein visibility
         if vein_density < 5:
@@ -485,27 +740,27 @@ class LeafImageAnalyzer:
             "iron_deficiency_indicator": green_vein_percentage > 10 and yellow_surface_percentage > 20
         }
     
-    def extract_glossiness(self, img: np.ndarray) -> Dict:
+    def extract_glossiness(self, ctx: Dict) -> Dict:
         """
         Extract glossiness/dullness features (Feature #9).
         
         Analyzes surface reflection and brightness variation.
         """
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray, inv_area_pct = ctx["gray"], ctx["inv_area_pct"]
         
         # Calculate brightness variation (glossy = high variation, dull = low variation)
-        brightness_std = np.std(gray)
-        brightness_mean = np.mean(gray)
+        brightness_std = float(cv2.meanStdDev(gray)[1][0, 0])
         
         # Detect glossy regions (high local brightness variation)
-        kernel = np.ones((10, 10), np.float32) / 100
-        local_mean = cv2.filter2D(gray.astype(np.float32), -1, kernel)
-        local_std = cv2.filter2D((gray.astype(np.float32) - local_mean) ** 2, -1, kernel)
-        local_std = np.sqrt(local_std)
+        local_var = _local_variance(gray, 10)
+        # Clamp float rounding below zero (in place)
+        np.maximum(local_var, 0, out=local_var)
         
-        glossy_threshold = np.percentile(local_std, 75)
-        glossy_mask = local_std > glossy_threshold
-        glossiness_percentage = np.sum(glossy_mask) / (img.shape[0] * img.shape[1]) * 100
+        # The square root is monotonic, so thresholding the variance at
+        # its own percentile selects the same pixels as the local std
+        glossy_threshold = np.percentile(local_var, 75)
+        glossy_mask = local_var > glossy_threshold
+        glossiness_percentage = np.count_nonzero(glossy_mask) * inv_area_pct
         
         # Assess glossiness
         if glossiness_percentage > 30 and brightness_std > 30:
@@ -522,21 +777,21 @@ class LeafImageAnalyzer:
             "is_glossy": glossiness_percentage > 25 and brightness_std > 25
         }
     
-    def calculate_chlorophyll_index(self, img: np.ndarray) -> Dict:
+    def calculate_chlorophyll_index(self, ctx: Dict) -> Dict:
         """
         Calculate chlorophyll index (Feature #11 - Advanced).
         
         Estimates from green channel intensity.
         """
-        b, g, r = cv2.split(img)
+        mean_b, mean_g, mean_r = ctx["mean_b"], ctx["mean_g"], ctx["mean_r"]
         
         # Simple chlorophyll index (green intensity normalized)
-        chlorophyll_index = np.mean(g) / 255.0
+        chlorophyll_index = mean_g / 255.0
         
         # More sophisticated index using normalized difference
-        total_intensity = np.mean(r) + np.mean(g) + np.mean(b)
+        total_intensity = mean_r + mean_g + mean_b
         if total_intensity > 0:
-            green_ratio = np.mean(g) / total_intensity
+            green_ratio = mean_g / total_intensity
         else:
             green_ratio = 0
         
@@ -612,28 +867,21 @@ class LeafImageAnalyzer:
         - Mild Stress
         - Severe Stress
         """
-        stress_factors = 0
         max_stress = 10
         
-        # Check each feature for stress indicators
-        if not all_features.get("color_features", {}).get("assessment") == "Healthy":
-            stress_factors += 1
-        if not all_features.get("color_uniformity", {}).get("is_uniform", True):
-            stress_factors += 1
-        if not all_features.get("texture_features", {}).get("is_smooth", True):
-            stress_factors += 1
-        if all_features.get("spots_lesions", {}).get("has_lesions", False):
-            stress_factors += 2  # Lesions are more serious
-        if all_features.get("shape_deformation", {}).get("deformation_detected", False):
-            stress_factors += 1
-        if all_features.get("edge_condition", {}).get("edge_issues_detected", False):
-            stress_factors += 1
-        if all_features.get("size_area", {}).get("is_stunted", False):
-            stress_factors += 1
-        if all_features.get("vein_visibility", {}).get("prominent_veins", False):
-            stress_factors += 1
-        if not all_features.get("glossiness", {}).get("is_glossy", True):
-            stress_factors += 1
+        # Stress indicator of each feature, in STRESS_WEIGHTS order
+        flags = np.array([
+            all_features.get("color_features", {}).get("assessment") != "Healthy",
+            not all_features.get("color_uniformity", {}).get("is_uniform", True),
+            not all_features.get("texture_features", {}).get("is_smooth", True),
+            all_features.get("spots_lesions", {}).get("has_lesions", False),
+            all_features.get("shape_deformation", {}).get("deformation_detected", False),
+            all_features.get("edge_condition", {}).get("edge_issues_detected", False),
+            all_features.get("size_area", {}).get("is_stunted", False),
+            all_features.get("vein_visibility", {}).get("prominent_veins", False),
+            not all_features.get("glossiness", {}).get("is_glossy", True)
+        ], dtype=np.int8)
+        stress_factors = int(flags @ self.STRESS_WEIGHTS)
         
         stress_score = stress_factors / max_stress
         
@@ -662,36 +910,54 @@ class LeafImageAnalyzer:
         Returns:
             Dictionary containing all extracted features
         """
-        import logging
-        logger = logging.getLogger(__name__)
+        return self._run_analysis(self.base64_to_image, base64_image)
+    
+    def analyze_complete_bytes(self, image_bytes: bytes) -> Dict:
+        """
+        Perform complete analysis of all 12 features on already-decoded bytes.
         
+        Lets callers that hold the raw image bytes skip the base64 round trip.
+        
+        Args:
+            image_bytes: Encoded image file contents (JPEG, PNG, ...)
+            
+        Returns:
+            Dictionary containing all extracted features
+        """
+        return self._run_analysis(self.bytes_to_image, image_bytes)
+    
+    def _run_analysis(self, decode, data) -> Dict:
+        """Decode the image with `decode(data)` and extract all features."""
         try:
-            # Convert base64 to image
-            logger.info("Converting base64 to image...")
-            img = self.base64_to_image(base64_image)
+            # Convert input to image
+            logger.info("Decoding image...")
+            img = decode(data)
             logger.info(f"Image converted successfully. Shape: {img.shape}")
             
+            # Compute shared color spaces once for all extractors
+            ctx = self._prepare(img)
+            
             # Extract all features
             logger.info("Extracting color features...")
-            color_features = self.extract_leaf_color_features(img)
+            color_features = self.extract_leaf_color_features(ctx)
             logger.info("Extracting color uniformity...")
-            color_uniformity = self.extract_color_uniformity(img)
+            color_uniformity = self.extract_color_uniformity(ctx)
             logger.info("Extracting texture features...")
-            texture_features = self.extract_texture_features(img)
+            texture_features = self.extract_texture_features(ctx)
             logger.info("Extracting spots/lesions...")
-            spots_lesions = self.extract_spots_lesions(img)
+            spots_lesions = self.extract_spots_lesions(ctx)
             logger.info("Extracting shape deformation...")
-            shape_deformation = self.extract_shape_deformation(img)
+            shape_deformation = self.extract_shape_deformation(ctx)
             logger.info("Extracting edge condition...")
-            edge_condition = self.extract_edge_condition(img)
+            edge_condition = self.extract_edge_condition(ctx)
             logger.info("Extracting size/area...")
-            size_area = self.extract_size_area(img)
+            size_area = self.extract_size_area(ctx)
             logger.info("Extracting vein visibility...")
-            vein_visibility = self.extract_vein_visibility(img)
+            vein_visibility = self.extract_vein_visibility(ctx)
             logger.info("Extracting glossiness...")
-            glossiness = self.extract_glossiness(img)
+            glossiness = self.extract_glossiness(ctx)
             logger.info("Calculating chlorophyll index...")
-            chlorophyll_index = self.calculate_chlorophyll_index(img)
+            chlorophyll_index = self.calculate_chlorophyll_index(ctx)
             
             # Combine features for stress calculation
             all_features = {
@@ -710,7 +976,7 @@ class LeafImageAnalyzer:
             stress_indicators = self.calculate_stress_score(all_features)
             
             # Estimate pH proxy
-            ph_proxy = self.estimate_ph_proxy(img, color_features, texture_features, 
+            ph_proxy = self.estimate_ph_proxy(ctx["bgr"], color_features, texture_features, 
                                              stress_indicators["stress_score"])
             
             # Return complete analysis
@@ -745,4 +1011,23 @@ class LeafImageAnalyzer:
                 "11_chlorophyll_index": {},
                 "12_ph_proxy": {}
             }
-
+    
+    def analyze_batch(self, images: List[bytes], workers: Optional[int] = None) -> List[Dict]:
+        """
+        Analyze several images concurrently.
+        
+        OpenCV releases the GIL inside its calls, so a thread pool scales
+        across images. OpenCV's own thread count is process-global and is
+        left untouched here, since other requests may be running in parallel.
+        
+        Args:
+            images: Encoded image file contents (JPEG, PNG, ...), one per image
+            workers: Number of worker threads (defaults to the CPU count)
+            
+        Returns:
+            One analyze_complete_bytes result per image, in input order
+        """
+        if not images:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(images), workers or os.cpu_count() or 1)) as executor:
+            return list(executor.map(self.analyze_complete_bytes, images))
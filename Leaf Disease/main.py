@@ -1,19 +1,35 @@
 import os
-import json
 import logging
 import sys
-from typing import Dict, Optional, List, Any
+import re
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, List, Any, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime
+from functools import lru_cache
+from datetime import datetime, timezone
 
-from groq import Groq
+import orjson
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
 
+# Optional SIMD base64 codec
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 # Import image feature analyzer
 try:
-    from .image_features import LeafImageAnalyzer
+    from .image_features import (LeafImageAnalyzer, decode_base64_image, normalize_base64,
+                                 detect_image_format)
 except ImportError:
-    from image_features import LeafImageAnalyzer
+    from image_features import (LeafImageAnalyzer, decode_base64_image, normalize_base64,
+                                detect_image_format)
 
 
 # Configure logging
@@ -21,144 +37,18 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Leading ```/```json and trailing ``` markdown fences around a response
+_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.IGNORECASE)
 
-@dataclass
-class DiseaseAnalysisResult:
-    """
-    Data class for storing comprehensive disease analysis results.
-
-    This class encapsulates all the information returned from a leaf disease
-    analysis, including detection status, disease identification, severity
-    assessment, treatment recommendations, and comprehensive feature analysis.
-
-    Attributes:
-        disease_detected (bool): Whether a disease was detected in the leaf image
-        disease_name (Optional[str]): Name of the identified disease, None if healthy
-        disease_type (str): Category of disease (fungal, bacterial, viral, pest, etc.)
-        severity (str): Severity level (mild, moderate, severe, none)
-        confidence (float): Confidence score (0-100)
-        symptoms (List[str]): List of observed symptoms
-        possible_causes (List[str]): List of possible causes
-        treatment (List[str]): List of treatment recommendations
-        analysis_timestamp (str): Timestamp of analysis
-        feature_analysis (Dict): Comprehensive feature analysis including all 12 features
-        farmer_recommendations (Dict): Farmer-specific recommendations including economic impact
-    """
-    disease_detected: bool
-    disease_name: Optional[str]
-    disease_type: str
-    severity: str
-    confidence: float
-    symptoms: List[str]
-    possible_causes: List[str]
-    treatment: List[str]
-    analysis_timestamp: str = field(default_factory=lambda: datetime.now().astimezone().isoformat())
-    feature_analysis: Dict[str, Any] = field(default_factory=dict)
-    farmer_recommendations: Dict[str, Any] = field(default_factory=dict)
-
-
-class LeafDiseaseDetector:
-    """
-    Advanced Leaf Disease Detection System using AI Vision Analysis.
-
-    This class provides comprehensive leaf disease detection capabilities using
-    the Groq API with Llama Vision models. It can analyze leaf images to identify
-    diseases, assess severity, and provide treatment recommendations. The system
-    also validates that uploaded images contain actual plant leaves and rejects
-    images of humans, animals, or other non-plant objects.
-
-    The system supports base64 encoded images and returns structured JSON results
-    containing disease information, confidence scores, symptoms, causes, and
-    treatment suggestions.
-
-    Features:
-        - Image validation (ensures uploaded images contain plant leaves)
-        - Multi-disease detection (fungal, bacterial, viral, pest, nutrient deficiency)
-        - Severity assessment (mild, moderate, severe)
-        - Confidence scoring (0-100%)
-        - Symptom identification
-        - Treatment recommendations
-        - Robust error handling and response parsing
-        - Invalid image type detection and rejection
-
-    Attributes:
-        MODEL_NAME (str): The AI model used for analysis
-        DEFAULT_TEMPERATURE (float): Default temperature for response generation
-        DEFAULT_MAX_TOKENS (int): Default maximum tokens for responses
-        api_key (str): Groq API key for authentication
-        client (Groq): Groq API client instance
-
-    Example:
-        >>> detector = LeafDiseaseDetector()
-        >>> result = detector.analyze_leaf_image_base64(base64_image_data)
-        >>> if result['disease_type'] == 'invalid_image':
-        ...     print("Please upload a plant leaf image")
-        >>> elif result['disease_detected']:
-        ...     print(f"Disease detected: {result['disease_name']}")
-        >>> else:
-        ...     print("Healthy leaf detected")
-    """
-
-    MODEL_NAME = "meta-llama/llama-4-scout-17b-16e-instruct"
-    DEFAULT_TEMPERATURE = 0.3
-    DEFAULT_MAX_TOKENS = 2048  # Increased for comprehensive feature analysis
-
-    def __init__(self, api_key: Optional[str] = None):
-        """
-        Initialize the Leaf Disease Detector with API credentials.
-
-        Sets up the Groq API client and validates the API key from either
-        the parameter or environment variables. Initializes logging for
-        tracking analysis operations.
-
-        Args:
-            api_key (Optional[str]): Groq API key. If None, will attempt to
-                                   load from GROQ_API_KEY environment variable.
-
-        Raises:
-            ValueError: If no valid API key is found in parameters or environment.
-
-        Note:
-            Ensure your .env file contains GROQ_API_KEY or pass it directly.
-        """
-        load_dotenv()
-        self.api_key = api_key or os.environ.get("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
-        self.client = Groq(api_key=self.api_key)
-        self.image_analyzer = LeafImageAnalyzer()
-        logger.info("Leaf Disease Detector initialized with comprehensive feature analysis")
-
-    def create_analysis_prompt(self, feature_summary: Optional[Dict] = None) -> str:
-        """
-        Create the standardized analysis prompt for the AI model with comprehensive feature evaluation.
+# Outermost {...} span, used to salvage JSON wrapped in extra text
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
 
-        Generates a comprehensive prompt that instructs the AI model to analyze
-        leaf images for diseases and evaluate all 12 key features. The prompt
-        specifies the required output format and analysis criteria.
+# Outermost [...] span, the same salvage for multi-image responses
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
 
-        Args:
-            feature_summary (Optional[Dict]): Summary of computer vision extracted features
 
-        Returns:
-            str: Formatted prompt string with instructions for disease analysis
-                 and comprehensive feature evaluation.
-        """
-        feature_context = ""
-        if feature_summary:
-            feature_context = f"""
-            
-COMPUTER VISION ANALYSIS SUMMARY (for reference):
-- Leaf Color: {feature_summary.get('color_status', 'N/A')}
-- Color Uniformity: {feature_summary.get('uniformity_status', 'N/A')}
-- Texture: {feature_summary.get('texture_status', 'N/A')}
-- Lesions/Spots: {feature_summary.get('lesion_status', 'N/A')}
-- Shape: {feature_summary.get('shape_status', 'N/A')}
-- Edge Condition: {feature_summary.get('edge_status', 'N/A')}
-- Overall Health: {feature_summary.get('health_status', 'N/A')}
-"""
-        
-        return f"""IMPORTANT: First determine if this image contains a plant leaf or vegetation. If the image shows humans, animals, objects, buildings, or anything other than plant leaves/vegetation, return the "invalid_image" response format below.
+# Static parts of the analysis prompt, built once at import time
+_PROMPT_HEAD = """IMPORTANT: First determine if this image contains a plant leaf or vegetation. If the image shows humans, animals, objects, buildings, or anything other than plant leaves/vegetation, return the "invalid_image" response format below.
 
 If this is a valid leaf/plant image, perform COMPREHENSIVE ANALYSIS evaluating all 12 key features and return results in JSON format.
 
@@ -225,10 +115,12 @@ COMPREHENSIVE FEATURE EVALUATION REQUIRED:
    - Estimate indirectly from color changes, stress patterns, chlorophyll level, texture
    - Provide: "Low pH (Acidic)" / "Normal pH" / "High pH (Alkaline)"
    - Note: This is an indirect estimate, not exact numeric value
-{feature_context}
+"""
+
+_PROMPT_TAIL = """
 
 For NON-LEAF images, return:
-{{
+{
     "disease_detected": false,
     "disease_name": null,
     "disease_type": "invalid_image",
@@ -237,24 +129,24 @@ For NON-LEAF images, return:
     "symptoms": ["This image does not contain a plant leaf"],
     "possible_causes": ["Invalid image type uploaded"],
     "treatment": ["Please upload an image of a plant leaf for disease analysis"],
-    "feature_evaluation": {{
-        "1_leaf_color": {{"assessment": "N/A - Invalid Image"}},
-        "2_color_uniformity": {{"assessment": "N/A - Invalid Image"}},
-        "3_leaf_texture": {{"assessment": "N/A - Invalid Image"}},
-        "4_spots_lesions": {{"assessment": "N/A - Invalid Image"}},
-        "5_shape_deformation": {{"assessment": "N/A - Invalid Image"}},
-        "6_edge_condition": {{"assessment": "N/A - Invalid Image"}},
-        "7_size_area": {{"assessment": "N/A - Invalid Image"}},
-        "8_vein_visibility": {{"assessment": "N/A - Invalid Image"}},
-        "9_glossiness": {{"assessment": "N/A - Invalid Image"}},
-        "10_stress_indicators": {{"health_status": "N/A - Invalid Image"}},
-        "11_chlorophyll_index": {{"assessment": "N/A - Invalid Image"}},
-        "12_ph_proxy": {{"ph_estimate": "N/A - Invalid Image"}}
-    }}
-}}
+    "feature_evaluation": {
+        "1_leaf_color": {"assessment": "N/A - Invalid Image"},
+        "2_color_uniformity": {"assessment": "N/A - Invalid Image"},
+        "3_leaf_texture": {"assessment": "N/A - Invalid Image"},
+        "4_spots_lesions": {"assessment": "N/A - Invalid Image"},
+        "5_shape_deformation": {"assessment": "N/A - Invalid Image"},
+        "6_edge_condition": {"assessment": "N/A - Invalid Image"},
+        "7_size_area": {"assessment": "N/A - Invalid Image"},
+        "8_vein_visibility": {"assessment": "N/A - Invalid Image"},
+        "9_glossiness": {"assessment": "N/A - Invalid Image"},
+        "10_stress_indicators": {"health_status": "N/A - Invalid Image"},
+        "11_chlorophyll_index": {"assessment": "N/A - Invalid Image"},
+        "12_ph_proxy": {"ph_estimate": "N/A - Invalid Image"}
+    }
+}
 
 For VALID LEAF images, return this COMPREHENSIVE format:
-{{
+{
     "disease_detected": true/false,
     "disease_name": "name of disease or null",
     "disease_type": "fungal/bacterial/viral/pest/nutrient deficiency/healthy",
@@ -263,7 +155,7 @@ For VALID LEAF images, return this COMPREHENSIVE format:
     "symptoms": ["list", "of", "symptoms"],
     "possible_causes": ["list", "of", "causes"],
     "treatment": ["list", "of", "treatments"],
-    "farmer_recommendations": {{
+    "farmer_recommendations": {
         "action_urgency": "Immediate (1-2 days) / Soon (3-7 days) / Monitor (7-14 days) / No urgent action",
         "economic_impact": "High risk - may lose 30-70% yield / Moderate risk - 10-30% yield loss / Low risk - less than 10% impact / No economic impact",
         "prevention_tips": ["tip 1 to prevent disease spread", "tip 2 for future crops"],
@@ -282,375 +174,1209 @@ For VALID LEAF images, return this COMPREHENSIVE format:
         "harvest_withdrawal": "Waiting period before harvest after any chemical spray",
         "photo_tip": "How to take a clearer leaf photo next time for better AI analysis",
         "product_recommendations": [
-            {{
+            {
                 "product_name": "Product name farmers can buy",
                 "store": "Amazon or Flipkart",
                 "url": "https://... (use a real, currently available product link from Amazon.in or Flipkart)",
                 "price_hint": "INR price range if known",
                 "usage_note": "How/when to use it for this disease"
-            }}
+            }
         ]
-    }},
-    "feature_evaluation": {{
-        "1_leaf_color": {{
+    },
+    "feature_evaluation": {
+        "1_leaf_color": {
             "green_intensity": "high/moderate/low",
             "yellowing_detected": true/false,
             "pale_detected": true/false,
             "dark_green_detected": true/false,
             "assessment": "Healthy Green / Yellowing / Pale / Dark Green / Moderate",
             "nutrient_indicators": ["nitrogen deficiency" if yellowing, "iron deficiency" if pale, etc.]
-        }},
-        "2_color_uniformity": {{
+        },
+        "2_color_uniformity": {
             "is_uniform": true/false,
             "patchiness_detected": true/false,
             "assessment": "Uniform (Healthy) / Patchy (Stress/Deficiency/Disease) / Moderately Uniform"
-        }},
-        "3_leaf_texture": {{
+        },
+        "3_leaf_texture": {
             "texture_type": "smooth/rough/spotted/wrinkled",
             "abnormalities_detected": true/false,
             "assessment": "Smooth (Healthy) / Rough/Spotted (Disease or Stress) / Moderate Texture"
-        }},
-        "4_spots_lesions_discoloration": {{
+        },
+        "4_spots_lesions_discoloration": {
             "brown_spots": true/false,
             "white_patches": true/false,
             "black_lesions": true/false,
             "yellow_margins": true/false,
             "severity": "none/mild/moderate/severe",
             "assessment": "No Significant Lesions / Mild / Moderate / Severe Lesions/Discoloration"
-        }},
-        "5_leaf_shape_deformation": {{
+        },
+        "5_leaf_shape_deformation": {
             "deformation_detected": true/false,
             "deformation_type": "curling/folding/shrinking/twisting/none",
             "assessment": "Normal Shape / Mild Deformation / Deformed"
-        }},
-        "6_leaf_edge_condition": {{
+        },
+        "6_leaf_edge_condition": {
             "burnt_edges": true/false,
             "yellow_edges": true/false,
             "dry_margins": true/false,
             "assessment": "Healthy Edges / Burnt Edges (Potassium Deficiency) / Yellow Edges (Magnesium Deficiency) / Dry Margins (Water Stress)"
-        }},
-        "7_leaf_size_area": {{
+        },
+        "7_leaf_size_area": {
             "size_assessment": "normal/moderate/small",
             "stunted_growth": true/false,
             "assessment": "Normal/Large Size / Moderate Size / Small Size (Stunted Growth)"
-        }},
-        "8_vein_color_visibility": {{
+        },
+        "8_vein_color_visibility": {
             "vein_visibility": "normal/prominent/not_visible",
             "green_veins_yellow_surface": true/false,
             "iron_deficiency_indicator": true/false,
             "assessment": "Normal Vein Visibility / Green Veins + Yellow Surface (Iron Deficiency) / Prominent Veins (Stress)"
-        }},
-        "9_glossiness_dullness": {{
+        },
+        "9_glossiness_dullness": {
             "surface_quality": "glossy/dull/moderate",
             "assessment": "Glossy (Healthy) / Dull/Dusty (Stress or Aging) / Moderate Glossiness"
-        }},
-        "10_stress_indicators": {{
+        },
+        "10_stress_indicators": {
             "health_status": "🟢 Healthy / 🟡 Mild Stress / 🔴 Severe Stress",
             "stress_level": "low/moderate/high",
             "overall_assessment": "Healthy / Mild Stress / Severe Stress"
-        }},
-        "11_chlorophyll_index": {{
+        },
+        "11_chlorophyll_index": {
             "chlorophyll_level": "high/moderate/low",
             "nitrogen_level_estimate": "high/moderate/low",
             "assessment": "High (Good Nitrogen Level) / Moderate / Low (Possible Nitrogen Deficiency)"
-        }},
-        "12_ph_proxy": {{
+        },
+        "12_ph_proxy": {
             "ph_estimate": "Low pH (Acidic) / Normal pH / High pH (Alkaline)",
             "confidence": "Low (Indirect Estimation)",
             "indicators": ["list of indicators used for estimation"]
-        }}
-    }}
-}}
+        }
+    }
+}
 
 IMPORTANT: Provide detailed, accurate evaluation for ALL 12 features. This analysis helps farmers understand their crop health comprehensively."""
 
-    def analyze_leaf_image_base64(self, base64_image: str,
-                                  temperature: float = None,
-                                  max_tokens: int = None) -> Dict:
-        """
-        Analyze base64 encoded image data for leaf diseases with comprehensive feature analysis.
+# Feature summary keys listed in the prompt's CV context, in order
+_SUMMARY_FIELDS = ("color_status", "uniformity_status", "texture_status", "lesion_status",
+                   "shape_status", "edge_status", "health_status")
 
-        First validates that the image contains a plant leaf. If the image shows
-        humans, animals, objects, or other non-plant content, returns an 
-        'invalid_image' response. For valid leaf images, performs comprehensive
-        disease analysis including all 12 feature evaluations.
 
-        Args:
-            base64_image (str): Base64 encoded image data (without data:image prefix)
-            temperature (float, optional): Model temperature for response generation
-            max_tokens (int, optional): Maximum tokens for response
+def _feature_context(summary_values: Tuple[str, ...]) -> str:
+    """Format the prompt's CV summary block for one tuple of summary values."""
+    color, uniformity, texture, lesion, shape, edge, health = summary_values
+    return f"""
+            
+COMPUTER VISION ANALYSIS SUMMARY (for reference):
+- Leaf Color: {color}
+- Color Uniformity: {uniformity}
+- Texture: {texture}
+- Lesions/Spots: {lesion}
+- Shape: {shape}
+- Edge Condition: {edge}
+- Overall Health: {health}
+"""
 
-        Returns:
-            Dict: Analysis results as dictionary (JSON serializable)
-                 - For invalid images: disease_type will be 'invalid_image'
-                 - For valid leaves: comprehensive disease analysis with all 12 features
 
-        Raises:
-            Exception: If analysis fails
-        """
-        try:
-            logger.info("Starting comprehensive analysis for base64 image data")
+@lru_cache(maxsize=128)
+def _build_prompt(summary_values: Optional[Tuple[str, ...]]) -> str:
+    """Assemble the analysis prompt for one tuple of CV summary values."""
+    if not summary_values:
+        return _PROMPT_HEAD + _PROMPT_TAIL
+    return _PROMPT_HEAD + _feature_context(summary_values) + _PROMPT_TAIL
 
-            # Validate base64 input
-            if not isinstance(base64_image, str):
-                raise ValueError("base64_image must be a string")
-
-            if not base64_image:
-                raise ValueError("base64_image cannot be empty")
-
-            # Clean base64 string (remove data URL prefix if present)
-            clean_base64 = base64_image
-            if base64_image.startswith('data:'):
-                clean_base64 = base64_image.split(',', 1)[1]
-
-            # Extract computer vision features first
-            logger.info("Extracting computer vision features...")
-            try:
-                cv_features = self.image_analyzer.analyze_complete(clean_base64)
-                if "error" in cv_features:
-                    logger.warning(f"CV feature extraction had errors: {cv_features.get('error')}")
-                    # Continue with analysis even if CV features fail
-                    cv_features = {}
-            except Exception as cv_error:
-                logger.warning(f"CV feature extraction failed: {str(cv_error)}, continuing with Groq analysis only")
-                cv_features = {}
-            
-            # Create feature summary for AI prompt
-            feature_summary = {}
-            if "10_stress_indicators" in cv_features:
-                feature_summary["health_status"] = cv_features["10_stress_indicators"].get("health_status", "N/A")
-            if "1_leaf_color" in cv_features:
-                feature_summary["color_status"] = cv_features["1_leaf_color"].get("color_status", "N/A")
-            if "2_color_uniformity" in cv_features:
-                feature_summary["uniformity_status"] = cv_features["2_color_uniformity"].get("uniformity_status", "N/A")
-            if "3_leaf_texture" in cv_features:
-                feature_summary["texture_status"] = cv_features["3_leaf_texture"].get("texture_status", "N/A")
-            if "4_spots_lesions_discoloration" in cv_features:
-                feature_summary["lesion_status"] = cv_features["4_spots_lesions_discoloration"].get("lesion_status", "N/A")
-            if "5_leaf_shape_deformation" in cv_features:
-                feature_summary["shape_status"] = cv_features["5_leaf_shape_deformation"].get("shape_status", "N/A")
-            if "6_leaf_edge_condition" in cv_features:
-                feature_summary["edge_status"] = cv_features["6_leaf_edge_condition"].get("edge_status", "N/A")
-
-            # Prepare request parameters
-            temperature = temperature or self.DEFAULT_TEMPERATURE
-            max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
 
-            # Create enhanced prompt with feature context
-            prompt = self.create_analysis_prompt(feature_summary)
+# Wrappers turning the single-image prompt into a multi-image one
+_BATCH_PROMPT_INTRO = """You are given {count} images, numbered 1 to {count} in the order they appear. Analyze EACH image independently using the instructions below.
 
-            # Make API request
-            logger.info("Sending request to AI model for comprehensive analysis...")
-            completion = self.client.chat.completions.create(
-                model=self.MODEL_NAME,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{clean_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                temperature=temperature,
-                max_completion_tokens=max_tokens,
-                top_p=1,
-                stream=False,
-                stop=None,
-            )
-
-            logger.info("API request completed successfully")
-            result = self._parse_response(
-                completion.choices[0].message.content, cv_features)
-
-            # Return as dictionary for JSON serialization
-            result_dict = result.__dict__
-            
-            # Convert NumPy types to Python native types for JSON serialization
-            import numpy as np
-            def convert_numpy_types(obj):
-                """Recursively convert NumPy types to native Python types"""
-                if isinstance(obj, (np.integer, np.intc, np.intp, np.int8,
-                                   np.int16, np.int32, np.int64, np.uint8, np.uint16,
-                                   np.uint32, np.uint64)):
-                    return int(obj)
-                elif isinstance(obj, (np.floating, np.float16, np.float32, np.float64)):
-                    return float(obj)
-                elif isinstance(obj, np.bool_):
-                    return bool(obj)
-                elif isinstance(obj, np.ndarray):
-                    return obj.tolist()
-                elif isinstance(obj, dict):
-                    return {key: convert_numpy_types(value) for key, value in obj.items()}
-                elif isinstance(obj, (list, tuple)):
-                    return [convert_numpy_types(item) for item in obj]
-                else:
-                    return obj
-            
-            result_dict = convert_numpy_types(result_dict)
-            
-            logger.info(f"Returning result with keys: {list(result_dict.keys())}")
-            return result_dict
+"""
 
-        except Exception as e:
-            logger.error(f"Analysis failed for base64 image data: {str(e)}")
-            raise
+_BATCH_PROMPT_OUTRO = """
 
-    def _parse_response(self, response_content: str, cv_features: Dict = None) -> DiseaseAnalysisResult:
-        """
-        Parse and validate API response with comprehensive feature analysis
+Return a JSON array with exactly {count} objects, one per image in the same order, each using the format above. Return only the JSON array."""
 
-        Args:
-            response_content (str): Raw response from API
-            cv_features (Dict, optional): Computer vision extracted features
 
-        Returns:
-            DiseaseAnalysisResult: Parsed and validated results with feature analysis
-        """
+def _timestamp() -> str:
+    """ISO 8601 UTC timestamp recorded on each analysis result."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+# (CV feature key, status field, feature_summary key) for the prompt's CV context
+_SUMMARY_MAP = (
+    ("10_stress_indicators", "health_status", "health_status"),
+    ("1_leaf_color", "color_status", "color_status"),
+    ("2_color_uniformity", "uniformity_status", "uniformity_status"),
+    ("3_leaf_texture", "texture_status", "texture_status"),
+    ("4_spots_lesions_discoloration", "lesion_status", "lesion_status"),
+    ("5_leaf_shape_deformation", "shape_status", "shape_status"),
+    ("6_leaf_edge_condition", "edge_status", "edge_status"),
+)
+
+
+# Response returned without calling the model when CV finds no plant
+# tissue; mirrors the "invalid_image" format the prompt asks for
+_INVALID_IMAGE_RESPONSE = {
+    "disease_detected": False,
+    "disease_name": None,
+    "disease_type": "invalid_image",
+    "severity": "none",
+    "confidence": 95,
+    "symptoms": ["This image does not contain a plant leaf"],
+    "possible_causes": ["Invalid image type uploaded"],
+    "treatment": ["Please upload an image of a plant leaf for disease analysis"],
+    "feature_evaluation": {
+        "1_leaf_color": {"assessment": "N/A - Invalid Image"},
+        "2_color_uniformity": {"assessment": "N/A - Invalid Image"},
+        "3_leaf_texture": {"assessment": "N/A - Invalid Image"},
+        "4_spots_lesions": {"assessment": "N/A - Invalid Image"},
+        "5_shape_deformation": {"assessment": "N/A - Invalid Image"},
+        "6_edge_condition": {"assessment": "N/A - Invalid Image"},
+        "7_size_area": {"assessment": "N/A - Invalid Image"},
+        "8_vein_visibility": {"assessment": "N/A - Invalid Image"},
+        "9_glossiness": {"assessment": "N/A - Invalid Image"},
+        "10_stress_indicators": {"health_status": "N/A - Invalid Image"},
+        "11_chlorophyll_index": {"assessment": "N/A - Invalid Image"},
+        "12_ph_proxy": {"ph_estimate": "N/A - Invalid Image"}
+    }
+}
+
+
+class _ResultCache:
+    """
+    Thread-safe LRU cache of analysis results with a time-to-live.
+
+    Results are stored serialized, so every hit hands out a fresh dict
+    that callers may mutate (e.g. translate) without touching the cache.
+    Serializing also converts NumPy scalars/arrays, so put() doubles as
+    the single conversion of a fresh result into native Python types.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a copy of the cached result, or None if missing or expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, payload = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+        return orjson.loads(payload)
+
+    def put(self, key: str, result: Dict) -> Dict:
+        """Store a result (evicting the least recently used) and return its native copy."""
+        payload = orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY)
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, payload)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return orjson.loads(payload)
+
+
+_RESULT_CACHE = _ResultCache()
+
+
+def _cache_key(image_bytes: bytes, temperature: float, max_tokens: int) -> str:
+    """Key a result by image content and the generation parameters."""
+    # Hash the decoded bytes (not the base64 text) so uploads and base64
+    # submissions of the same image share an entry
+    digest = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+    return f"{digest}:{temperature}:{max_tokens}"
+
+
+def _feature_summary(cv_features: Dict) -> Dict:
+    """Pick the status of each CV feature referenced by the prompt."""
+    return {out_key: cv_features[feature_key].get(status_key, "N/A")
+            for feature_key, status_key, out_key in _SUMMARY_MAP
+            if feature_key in cv_features}
+
+
+# Sync Groq clients shared across detector instances, keyed by API key, so
+# the underlying HTTP connection pool (and its TLS sessions) stays warm
+_CLIENT_CACHE: Dict[str, Groq] = {}
+
+
+def _shared_client(api_key: str) -> Groq:
+    """Return the cached Groq client for an API key, creating it on first use."""
+    client = _CLIENT_CACHE.get(api_key)
+    if client is None:
+        client = _CLIENT_CACHE[api_key] = Groq(api_key=api_key)
+    return client
+
+
+# Feature keys produced by LeafImageAnalyzer, in report order
+_FEATURE_KEYS = ("1_leaf_color", "2_color_uniformity", "3_leaf_texture",
+                 "4_spots_lesions_discoloration", "5_leaf_shape_deformation",
+                 "6_leaf_edge_condition", "7_leaf_size_area", "8_vein_color_visibility",
+                 "9_glossiness_dullness", "10_stress_indicators", "11_chlorophyll_index",
+                 "12_ph_proxy")
+
+# AI feature_evaluation keys that differ from the CV feature key
+_AI_KEY_ALIASES = {"4_spots_lesions_discoloration": "4_spots_lesions"}
+
+
+def _combine_features(cv_features: Dict, ai_feature_evaluation: Dict) -> Dict:
+    """Merge CV and AI results per feature, AI values taking precedence."""
+    combined = {}
+    for key in _FEATURE_KEYS:
+        merged = dict(cv_features.get(key, ()))
+        merged.update(ai_feature_evaluation.get(_AI_KEY_ALIASES.get(key, key), ()))
+        combined[key] = merged
+    return combined
+
+
+class _JsonStreamCollector:
+    """
+    Accumulate streamed response text until the top-level JSON value closes.
+
+    Tracks bracket depth (and string literals inside brackets) so the caller
+    can stop reading as soon as the analysis object (or, for multi-image
+    requests, array of objects) is complete, skipping any closing fence or
+    commentary the model appends after it. A span only counts as complete
+    when it parses as that value, so bracketed or quoted prose before the
+    JSON (e.g. "Results for [4] images:") does not end the stream early.
+    """
+
+    def __init__(self, opener: str = '{', closer: str = '}'):
+        self.opener = opener
+        self.closer = closer
+        self.parts: List[str] = []
+        self.length = 0
+        self.start = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+
+    def feed(self, text: str) -> bool:
+        """Append a chunk of text; return True once the JSON value is closed."""
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.depth:
+                self.in_string = True
+            elif ch == self.opener:
+                if not self.depth:
+                    self.start = self.length + i
+                self.depth += 1
+            elif ch == self.closer and self.depth:
+                self.depth -= 1
+                # Drop whatever follows the closing bracket in this chunk
+                if not self.depth and self._closes(text[:i + 1]):
+                    return True
+        self.parts.append(text)
+        self.length += len(text)
+        return False
+
+    def _closes(self, head: str) -> bool:
+        """Whether the span that just closed is the expected JSON value."""
+        text = "".join(self.parts) + head
         try:
-            # Clean up response - remove markdown code blocks if present
-            cleaned_response = response_content.strip()
-            if cleaned_response.startswith('```json'):
-                cleaned_response = cleaned_response.replace(
-                    '```json', '').replace('```', '').strip()
-            elif cleaned_response.startswith('```'):
-                cleaned_response = cleaned_response.replace('```', '').strip()
+            value = orjson.loads(text[self.start:])
+        except orjson.JSONDecodeError:
+            return False
+        if self.opener == '{':
+            expected = isinstance(value, dict)
+        else:
+            expected = bool(value) and all(isinstance(item, dict) for item in value)
+        if expected:
+            self.parts = [text]
+            self.length = len(text)
+            self.complete = True
+        return expected
+
+    @property
+    def text(self) -> str:
+        """Response text received so far."""
+        return "".join(self.parts)
 
-            # Parse JSON
-            disease_data = json.loads(cleaned_response)
-            logger.info("Response parsed successfully as JSON")
 
-            # Extract feature evaluation from AI response
-            ai_feature_evaluation = disease_data.get('feature_evaluation', {})
-            
-            # Merge AI evaluation with computer vision features
-            feature_analysis = {}
-            if cv_features:
-                # Combine CV features with AI evaluation
-                feature_analysis = {
-                    "computer_vision_analysis": cv_features,
-                    "ai_evaluation": ai_feature_evaluation,
-                    "combined_analysis": {
-                        "1_leaf_color": {
-                            **cv_features.get("1_leaf_color", {}),
-                            **ai_feature_evaluation.get("1_leaf_color", {})
-                        },
-                        "2_color_uniformity": {
-                            **cv_features.get("2_color_uniformity", {}),
-                            **ai_feature_evaluation.get("2_color_uniformity", {})
-                        },
-                        "3_leaf_texture": {
-                            **cv_features.get("3_leaf_texture", {}),
-                            **ai_feature_evaluation.get("3_leaf_texture", {})
-                        },
-                        "4_spots_lesions_discoloration": {
-                            **cv_features.get("4_spots_lesions_discoloration", {}),
-                            **ai_feature_evaluation.get("4_spots_lesions", {})
-                        },
-                        "5_leaf_shape_deformation": {
-                            **cv_features.get("5_leaf_shape_deformation", {}),
-                            **ai_feature_evaluation.get("5_leaf_shape_deformation", {})
-                        },
-                        "6_leaf_edge_condition": {
-                            **cv_features.get("6_leaf_edge_condition", {}),
-                            **ai_feature_evaluation.get("6_leaf_edge_condition", {})
-                        },
-                        "7_leaf_size_area": {
-                            **cv_features.get("7_leaf_size_area", {}),
-                            **ai_feature_evaluation.get("7_leaf_size_area", {})
-                        },
-                        "8_vein_color_visibility": {
-                            **cv_features.get("8_vein_color_visibility", {}),
-                            **ai_feature_evaluation.get("8_vein_color_visibility", {})
-                        },
-                        "9_glossiness_dullness": {
-                            **cv_features.get("9_glossiness_dullness", {}),
-                            **ai_feature_evaluation.get("9_glossiness_dullness", {})
-                        },
-                        "10_stress_indicators": {
-                            **cv_features.get("10_stress_indicators", {}),
-                            **ai_feature_evaluation.get("10_stress_indicators", {})
-                        },
-                        "11_chlorophyll_index": {
-                            **cv_features.get("11_chlorophyll_index", {}),
-                            **ai_feature_evaluation.get("11_chlorophyll_index", {})
-                        },
-                        "12_ph_proxy": {
-                            **cv_features.get("12_ph_proxy", {}),
-                            **ai_feature_evaluation.get("12_ph_proxy", {})
-                        }
-                    }
-                }
-            else:
-                # Use only AI evaluation if CV features not available
-                feature_analysis = {"ai_evaluation": ai_feature_evaluation}
-
-            # Validate required fields and create result object
-            return DiseaseAnalysisResult(
-                disease_detected=bool(
-                    disease_data.get('disease_detected', False)),
-                disease_name=disease_data.get('disease_name'),
-                disease_type=disease_data.get('disease_type', 'unknown'),
-                severity=disease_data.get('severity', 'unknown'),
-                confidence=float(disease_data.get('confidence', 0)),
-                symptoms=disease_data.get('symptoms', []),
-                possible_causes=disease_data.get('possible_causes', []),
-                treatment=disease_data.get('treatment', []),
-                feature_analysis=feature_analysis,
-                farmer_recommendations=disease_data.get('farmer_recommendations', {})
-            )
-
-        except json.JSONDecodeError:
-            logger.warning(
-                "Failed to parse as JSON, attempting to extract JSON from response")
+@dataclass
+class DiseaseAnalysisResult:
+    """
+    Data class for storing comprehensive disease analysis results.
 
-            # Try to find JSON in the response using regex
-            import re
-            json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
-            if json_match:
-                try:
-                    disease_data = json.loads(json_match.group())
-                    logger.info("JSON extracted and parsed successfully")
+    This class encapsulates all the information returned from a leaf disease
+    analysis, including detection status, disease identification, severity
+    assessment, treatment recommendations, and comprehensive feature analysis.
 
-                    # Extract feature evaluation
-                    ai_feature_evaluation = disease_data.get('feature_evaluation', {})
-                    
-                    # Merge CV and AI features for combined analysis
-                    combined_analysis = {}
-                    if cv_features:
-                        combined_analysis.update(cv_features)
-                    combined_analysis.update(ai_feature_evaluation)
-                    
-                    feature_analysis = {
-                        "computer_vision_analysis": cv_features if cv_features else {},
-                        "ai_evaluation": ai_feature_evaluation,
-                        "combined_analysis": combined_analysis
-                    }
+    Attributes:
+        disease_detected (bool): Whether a disease was detected in the leaf image
+        disease_name (Optional[str]): Name of the identified disease, None if healthy
+        disease_type (str): Category of disease (fungal, bacterial, viral, pest, etc.)
+        severity (str): Severity level (mild, moderate, severe, none)
+        confidence (float): Confidence score (0-100)
+        symptoms (List[str]): List of observed symptoms
+        possible_causes (List[str]): List of possible causes
+        treatment (List[str]): List of treatment recommendations
+        analysis_timestamp (str): Timestamp of analysis
+        feature_analysis (Dict): Comprehensive feature analysis including all 12 features
+        farmer_recommendations (Dict): Farmer-specific recommendations including economic impact
+    """
+    disease_detected: bool
+    disease_name: Optional[str]
+    disease_type: str
+    severity: str
+    confidence: float
+    symptoms: List[str]
+    possible_causes: List[str]
+    treatment: List[str]
+    analysis_timestamp: str = field(default_factory=_timestamp)
+    feature_analysis: Dict[str, Any] = field(default_factory=dict)
+    farmer_recommendations: Dict[str, Any] = field(default_factory=dict)
+
+
+class LeafDiseaseDetector:
+    """
+    Advanced Leaf Disease Detection System using AI Vision Analysis.
+
+    This class provides comprehensive leaf disease detection capabilities using
+    the Groq API with Llama Vision models. It can analyze leaf images to identify
+    diseases, assess severity, and provide treatment recommendations. The system
+    also validates that uploaded images contain actual plant leaves and rejects
+    images of humans, animals, or other non-plant objects.
+
+    The system supports base64 encoded images and returns structured JSON results
+    containing disease information, confidence scores, symptoms, causes, and
+    treatment suggestions.
 
-                    return DiseaseAnalysisResult(
-                        disease_detected=bool(
-                            disease_data.get('disease_detected', False)),
-                        disease_name=disease_data.get('disease_name'),
-                        disease_type=disease_data.get(
-                            'disease_type', 'unknown'),
-                        severity=disease_data.get('severity', 'unknown'),
-                        confidence=float(disease_data.get('confidence', 0)),
-                        symptoms=disease_data.get('symptoms', []),
-                        possible_causes=disease_data.get(
-                            'possible_causes', []),
-                        treatment=disease_data.get('treatment', []),
-                        feature_analysis=feature_analysis,
-                        farmer_recommendations=disease_data.get('farmer_recommendations', {})
-                    )
-                except json.JSONDecodeError:
+    Features:
+        - Image validation (ensures uploaded images contain plant leaves)
+        - Multi-disease detection (fungal, bacterial, viral, pest, nutrient deficiency)
+        - Severity assessment (mild, moderate, severe)
+        - Confidence scoring (0-100%)
+        - Symptom identification
+        - Treatment recommendations
+        - Robust error handling and response parsing
+        - Invalid image type detection and rejection
+
+    Attributes:
+        MODEL_NAME (str): The AI model used for analysis
+        DEFAULT_TEMPERATURE (float): Default temperature for response generation
+        DEFAULT_MAX_TOKENS (int): Default maximum tokens for responses
+        api_key (str): Groq API key for authentication
+        client (Groq): Groq API client instance
+        aclient (AsyncGroq): Async Groq API client for concurrent analyses
+
+    Example:
+        >>> detector = LeafDiseaseDetector()
+        >>> result = detector.analyze_leaf_image_base64(base64_image_data)
+        >>> if result['disease_type'] == 'invalid_image':
+        ...     print("Please upload a plant leaf image")
+        >>> elif result['disease_detected']:
+        ...     print(f"Disease detected: {result['disease_name']}")
+        >>> else:
+        ...     print("Healthy leaf detected")
+    """
+
+    MODEL_NAME = "meta-llama/llama-4-scout-17b-16e-instruct"
+    DEFAULT_TEMPERATURE = 0.3
+    DEFAULT_MAX_TOKENS = 2048  # Increased for comprehensive feature analysis
+
+    # Local non-leaf pre-check: an image is rejected without calling the
+    # model only when it has almost no plant-coloured pixels AND green
+    # does not dominate (diseased brown/yellow leaves pass the first test)
+    MIN_VEGETATION_PERCENTAGE = 2.0
+    MIN_GREEN_RATIO = 0.55
+
+    # Images per multi-image request: the model accepts up to 5, and 4
+    # analyses of DEFAULT_MAX_TOKENS fit its 8k completion limit
+    MAX_BATCH_IMAGES = 4
+
+    # Batch groups sent to the model at the same time
+    MAX_PARALLEL_GROUPS = 4
+
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Initialize the Leaf Disease Detector with API credentials.
+
+        Sets up the Groq API client and validates the API key from either
+        the parameter or environment variables. Initializes logging for
+        tracking analysis operations.
+
+        Args:
+            api_key (Optional[str]): Groq API key. If None, will attempt to
+                                   load from GROQ_API_KEY environment variable.
+
+        Raises:
+            ValueError: If no valid API key is found in parameters or environment.
+
+        Note:
+            Ensure your .env file contains GROQ_API_KEY or pass it directly.
+            The sync Groq client is shared between instances with the same
+            key; long-lived callers should still keep one detector around.
+        """
+        load_dotenv()
+        self.api_key = api_key or os.environ.get("GROQ_API_KEY")
+        if not self.api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+        self.client = _shared_client(self.api_key)
+        # Async connections are bound to the event loop that opened them,
+        # so the async client is not shared module-wide
+        self.aclient = AsyncGroq(api_key=self.api_key)
+        self.image_analyzer = LeafImageAnalyzer()
+        logger.info("Leaf Disease Detector initialized with comprehensive feature analysis")
+
+    def create_analysis_prompt(self, feature_summary: Optional[Dict] = None) -> str:
+        """
+        Create the standardized analysis prompt for the AI model with comprehensive feature evaluation.
+
+        Generates a comprehensive prompt that instructs the AI model to analyze
+        leaf images for diseases and evaluate all 12 key features. The prompt
+        specifies the required output format and analysis criteria.
+
+        Args:
+            feature_summary (Optional[Dict]): Summary of computer vision extracted features
+
+        Returns:
+            str: Formatted prompt string with instructions for disease analysis
+                 and comprehensive feature evaluation.
+        """
+        if not feature_summary:
+            return _build_prompt(None)
+        # Key the cached prompt on the summary values (dicts are unhashable)
+        return _build_prompt(tuple(feature_summary.get(key, 'N/A') for key in _SUMMARY_FIELDS))
+
+    def _build_messages(self, clean_base64: str, prompt: str) -> List[Dict]:
+        """
+        Build the chat messages carrying the analysis prompt and the image.
+
+        Args:
+            clean_base64 (str): Base64 image data without data URL prefix
+            prompt (str): Analysis prompt text
+
+        Returns:
+            List[Dict]: Messages payload for the chat completions API
+        """
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{clean_base64}"
+                        }
+                    }
+                ]
+            }
+        ]
+
+    def _clean_base64(self, base64_image: str) -> str:
+        """
+        Validate base64 input and strip any data URL prefix and whitespace.
+
+        Line-wrapped base64 (76-column MIME output of `base64` or
+        `openssl base64`) is unwrapped, so the strict decode accepts it and
+        the API payload carries no line breaks.
+
+        Args:
+            base64_image (str): Base64 encoded image data
+
+        Returns:
+            str: Base64 image data without data URL prefix or whitespace
+
+        Raises:
+            ValueError: If base64_image is not a non-empty string
+        """
+        # Validate base64 input
+        if not isinstance(base64_image, str):
+            raise ValueError("base64_image must be a string")
+
+        if not base64_image:
+            raise ValueError("base64_image cannot be empty")
+
+        return normalize_base64(base64_image)
+
+    def _decode_base64(self, clean_base64: str) -> bytes:
+        """
+        Strictly decode base64 image data, failing fast on malformed input.
+
+        The bytes feed the CV analyzer; the base64 text itself is reused
+        for the API payload.
+
+        Args:
+            clean_base64 (str): Base64 image data without data URL prefix
+
+        Returns:
+            bytes: Decoded image file contents
+
+        Raises:
+            ValueError: If the data is not valid base64 or not a supported image
+        """
+        try:
+            return decode_base64_image(clean_base64)
+        except ValueError as e:
+            raise ValueError(f"base64_image is {e}")
+
+    def _extract_cv_features(self, image_bytes: bytes) -> Dict:
+        """
+        Run the CV analyzer, returning an empty dict if it fails.
+
+        Args:
+            image_bytes (bytes): Decoded image file contents
+
+        Returns:
+            Dict: Computer vision extracted features (empty on failure)
+        """
+        logger.info("Extracting computer vision features...")
+        try:
+            cv_features = self.image_analyzer.analyze_complete_bytes(image_bytes)
+            if "error" in cv_features:
+                logger.warning(f"CV feature extraction had errors: {cv_features.get('error')}")
+                # Continue with analysis even if CV features fail
+                cv_features = {}
+        except Exception as cv_error:
+            logger.warning(f"CV feature extraction failed: {str(cv_error)}, continuing with Groq analysis only")
+            cv_features = {}
+        return cv_features
+
+    def _build_request(self, clean_base64: str, cv_features: Dict, temperature: float,
+                       max_tokens: int) -> Dict:
+        """
+        Build the chat.completions.create arguments, hinting CV results in the prompt.
+
+        Args:
+            clean_base64 (str): Base64 image data without data URL prefix
+            cv_features (Dict): Computer vision extracted features (may be empty)
+            temperature (float): Model temperature for response generation
+            max_tokens (int): Maximum tokens for response
+
+        Returns:
+            Dict: Keyword arguments for chat.completions.create
+        """
+        # Create enhanced prompt with feature context
+        prompt = self.create_analysis_prompt(_feature_summary(cv_features))
+
+        return {
+            "model": self.MODEL_NAME,
+            "messages": self._build_messages(clean_base64, prompt),
+            "temperature": temperature,
+            "max_completion_tokens": max_tokens,
+            "top_p": 1,
+            "stream": True,
+            "stop": None,
+        }
+
+    def _prepare_analysis(self, clean_base64: str, image_bytes: bytes, temperature: float,
+                          max_tokens: int) -> Tuple[Dict, Dict]:
+        """
+        Extract CV features and build the API request from them.
+
+        Args:
+            clean_base64 (str): Base64 image data without data URL prefix
+            image_bytes (bytes): Decoded image file contents
+            temperature (float): Model temperature for response generation
+            max_tokens (int): Maximum tokens for response
+
+        Returns:
+            Tuple[Dict, Dict]: CV features and keyword arguments for
+                               chat.completions.create
+        """
+        cv_features = self._extract_cv_features(image_bytes)
+        return cv_features, self._build_request(clean_base64, cv_features, temperature, max_tokens)
+
+    def _stream_response(self, request: Dict, collector: Optional[_JsonStreamCollector] = None) -> str:
+        """Stream a completion, stopping once the JSON object is complete."""
+        collector = collector or _JsonStreamCollector()
+        with self.client.chat.completions.create(**request) as stream:
+            for chunk in stream:
+                if chunk.choices and collector.feed(chunk.choices[0].delta.content or ""):
+                    break
+        return collector.text
+
+    async def _stream_response_async(self, request: Dict) -> str:
+        """Async variant of _stream_response on the async client."""
+        collector = _JsonStreamCollector()
+        async with await self.aclient.chat.completions.create(**request) as stream:
+            async for chunk in stream:
+                if chunk.choices and collector.feed(chunk.choices[0].delta.content or ""):
+                    break
+        return collector.text
+
+    def _finalize_result(self, response_content: str, cv_features: Dict) -> Dict:
+        """
+        Parse the model response into a result dict.
+
+        CV values may still be NumPy types; _RESULT_CACHE.put converts
+        them while serializing the result for the cache.
+
+        Args:
+            response_content (str): Raw response from API
+            cv_features (Dict): Computer vision extracted features
+
+        Returns:
+            Dict: Analysis results as dictionary
+        """
+        result = self._parse_response_dict(response_content, cv_features)
+        logger.info(f"Returning result with keys: {list(result.keys())}")
+        return result
+
+    def _is_non_leaf(self, cv_features: Dict) -> bool:
+        """
+        Decide from CV features alone whether an image obviously lacks a leaf.
+
+        Args:
+            cv_features (Dict): Computer vision extracted features
+
+        Returns:
+            bool: True if the image can be rejected without the AI model
+        """
+        color = cv_features.get("1_leaf_color")
+        if not color or "vegetation_percentage" not in color:
+            return False
+        return (color["vegetation_percentage"] < self.MIN_VEGETATION_PERCENTAGE
+                and color["green_ratio"] < self.MIN_GREEN_RATIO)
+
+    def _invalid_image_result(self, cv_features: Dict) -> Dict:
+        """
+        Build the 'invalid_image' result locally, without an API call.
+
+        Args:
+            cv_features (Dict): Computer vision extracted features
+
+        Returns:
+            Dict: Analysis results as dictionary
+        """
+        logger.info("No plant tissue detected by CV pre-check, skipping AI analysis")
+        feature_analysis = {
+            "computer_vision_analysis": cv_features,
+            "ai_evaluation": _INVALID_IMAGE_RESPONSE["feature_evaluation"]
+        }
+        return self._result_dict(_INVALID_IMAGE_RESPONSE, feature_analysis)
+
+    def analyze_leaf_image_base64(self, base64_image: str,
+                                  temperature: float = None,
+                                  max_tokens: int = None) -> Dict:
+        """
+        Analyze base64 encoded image data for leaf diseases with comprehensive feature analysis.
+
+        First validates that the image contains a plant leaf. If the image shows
+        humans, animals, objects, or other non-plant content, returns an 
+        'invalid_image' response. For valid leaf images, performs comprehensive
+        disease analysis including all 12 feature evaluations.
+
+        Args:
+            base64_image (str): Base64 encoded image data (without data:image prefix)
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+
+        Returns:
+            Dict: Analysis results as dictionary (JSON serializable)
+                 - For invalid images: disease_type will be 'invalid_image'
+                 - For valid leaves: comprehensive disease analysis with all 12 features
+
+        Raises:
+            Exception: If analysis fails
+        """
+        try:
+            logger.info("Starting comprehensive analysis for base64 image data")
+            clean_base64 = self._clean_base64(base64_image)
+            return self._analyze(self._decode_base64(clean_base64), clean_base64,
+                                 temperature, max_tokens)
+
+        except Exception as e:
+            logger.error(f"Analysis failed for base64 image data: {str(e)}")
+            raise
+
+    def analyze_leaf_image_bytes(self, image_bytes: bytes,
+                                 temperature: float = None,
+                                 max_tokens: int = None) -> Dict:
+        """
+        Analyze raw image file contents for leaf diseases.
+
+        Same analysis as analyze_leaf_image_base64, for callers that already
+        hold the file bytes (e.g. an upload): the CV analyzer decodes them
+        directly, and base64 is produced once, only for the API payload.
+        Non-JPEG uploads are re-encoded as JPEG for that payload, matching
+        the data URL's declared type and keeping it small.
+
+        Args:
+            image_bytes (bytes): Image file contents (JPEG, PNG, ...)
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+
+        Returns:
+            Dict: Analysis results as dictionary (JSON serializable)
+
+        Raises:
+            Exception: If analysis fails
+        """
+        try:
+            logger.info("Starting comprehensive analysis for raw image data")
+            if not isinstance(image_bytes, (bytes, bytearray, memoryview)):
+                raise ValueError("image_bytes must be a bytes-like object")
+
+            if not image_bytes:
+                raise ValueError("image_bytes cannot be empty")
+
+            if detect_image_format(image_bytes) is None:
+                raise ValueError("image_bytes is not a supported image (JPEG, PNG, WebP, BMP, TIFF, GIF)")
+
+            return self._analyze(image_bytes, None, temperature, max_tokens)
+
+        except Exception as e:
+            logger.error(f"Analysis failed for raw image data: {str(e)}")
+            raise
+
+    def _analyze(self, image_bytes: bytes, clean_base64: Optional[str],
+                 temperature: float = None, max_tokens: int = None) -> Dict:
+        """
+        Shared synchronous pipeline: cache lookup, CV pre-check, model call.
+
+        Args:
+            image_bytes (bytes): Image file contents
+            clean_base64 (str, optional): Base64 payload for the API; built
+                                          from image_bytes (as JPEG) when None
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+
+        Returns:
+            Dict: Analysis results as dictionary (JSON serializable)
+        """
+        temperature = temperature or self.DEFAULT_TEMPERATURE
+        max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
+
+        # Identical resubmissions are answered from the result cache
+        cache_key = _cache_key(image_bytes, temperature, max_tokens)
+        cached = _RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached analysis for previously seen image")
+            return cached
+
+        if clean_base64 is None:
+            payload = self.image_analyzer.to_jpeg_bytes(image_bytes)
+            clean_base64 = base64.b64encode(payload).decode('ascii')
+        cv_features, request = self._prepare_analysis(clean_base64, image_bytes,
+                                                      temperature, max_tokens)
+        if self._is_non_leaf(cv_features):
+            return _RESULT_CACHE.put(cache_key, self._invalid_image_result(cv_features))
+
+        # Make API request
+        logger.info("Sending request to AI model for comprehensive analysis...")
+        response_content = self._stream_response(request)
+
+        logger.info("API request completed successfully")
+        return _RESULT_CACHE.put(cache_key, self._finalize_result(response_content, cv_features))
+
+    async def analyze_leaf_image_base64_async(self, base64_image: str,
+                                              temperature: float = None,
+                                              max_tokens: int = None,
+                                              cv_hints: bool = True) -> Dict:
+        """
+        Async variant of analyze_leaf_image_base64.
+
+        CV feature extraction runs in a worker thread and the API call is
+        awaited on the async client, so the event loop stays free while
+        the model responds. With cv_hints=False the two run concurrently
+        (wall time max(cv, llm) instead of cv + llm), at the cost of the
+        prompt's CV summary and the local non-leaf pre-check.
+
+        Args:
+            base64_image (str): Base64 encoded image data
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+            cv_hints (bool): Wait for CV features and include them in the prompt
+
+        Returns:
+            Dict: Analysis results as dictionary (JSON serializable)
+
+        Raises:
+            Exception: If analysis fails
+        """
+        try:
+            logger.info("Starting async analysis for base64 image data")
+            clean_base64 = self._clean_base64(base64_image)
+            temperature = temperature or self.DEFAULT_TEMPERATURE
+            max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
+
+            image_bytes = self._decode_base64(clean_base64)
+            cache_key = _cache_key(image_bytes, temperature, max_tokens)
+            cached = _RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                logger.info("Returning cached analysis for previously seen image")
+                return cached
+
+            if cv_hints:
+                cv_features, request = await asyncio.to_thread(
+                    self._prepare_analysis, clean_base64, image_bytes, temperature, max_tokens)
+                if self._is_non_leaf(cv_features):
+                    return _RESULT_CACHE.put(cache_key, self._invalid_image_result(cv_features))
+
+                logger.info("Sending async request to AI model for comprehensive analysis...")
+                response_content = await self._stream_response_async(request)
+            else:
+                # Overlap CV extraction with the model call; the prompt goes
+                # without CV hints and the non-leaf pre-check is skipped
+                logger.info("Sending async request to AI model alongside CV extraction...")
+                request = self._build_request(clean_base64, {}, temperature, max_tokens)
+                cv_features, response_content = await asyncio.gather(
+                    asyncio.to_thread(self._extract_cv_features, image_bytes),
+                    self._stream_response_async(request))
+
+            logger.info("Async API request completed successfully")
+            return _RESULT_CACHE.put(cache_key, self._finalize_result(response_content, cv_features))
+
+        except Exception as e:
+            logger.error(f"Async analysis failed for base64 image data: {str(e)}")
+            raise
+
+    async def analyze_many(self, base64_images: List[str], concurrency: int = 8,
+                           temperature: float = None,
+                           max_tokens: int = None,
+                           cv_hints: bool = True) -> List[Dict]:
+        """
+        Analyze several images concurrently.
+
+        Requests are fanned out with asyncio.gather, with at most
+        `concurrency` analyses in flight to stay within API rate limits.
+
+        Args:
+            base64_images (List[str]): Base64 encoded images
+            concurrency (int): Maximum number of simultaneous analyses
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+            cv_hints (bool): Include CV features in each prompt (see
+                             analyze_leaf_image_base64_async)
+
+        Returns:
+            List[Dict]: One analysis result per image, in input order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def analyze_one(base64_image: str) -> Dict:
+            async with semaphore:
+                return await self.analyze_leaf_image_base64_async(
+                    base64_image, temperature, max_tokens, cv_hints)
+
+        return await asyncio.gather(*(analyze_one(image) for image in base64_images))
+
+    def analyze_batch(self, base64_images: List[str],
+                      temperature: float = None,
+                      max_tokens: int = None) -> List[Dict]:
+        """
+        Analyze several images with one API request per group of images.
+
+        Up to MAX_BATCH_IMAGES images share a single chat turn, so the
+        analysis prompt and request overhead are paid once per group, and
+        up to MAX_PARALLEL_GROUPS groups are in flight at once. Cached and
+        locally rejected (non-leaf) images never reach the model. A group
+        whose response does not hold one analysis per image is retried
+        image by image.
+
+        Args:
+            base64_images (List[str]): Base64 encoded images
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens per image analysis
+
+        Returns:
+            List[Dict]: One analysis result per image, in input order
+
+        Raises:
+            Exception: If analysis fails
+        """
+        try:
+            logger.info(f"Starting batch analysis of {len(base64_images)} images")
+            images = []
+            for base64_image in base64_images:
+                clean_base64 = self._clean_base64(base64_image)
+                images.append((self._decode_base64(clean_base64), clean_base64))
+            return self._analyze_batch(images, temperature, max_tokens)
+
+        except Exception as e:
+            logger.error(f"Batch analysis failed: {str(e)}")
+            raise
+
+    def analyze_batch_bytes(self, images: List[bytes],
+                            temperature: float = None,
+                            max_tokens: int = None) -> List[Dict]:
+        """
+        Batch variant of analyze_leaf_image_bytes.
+
+        Same grouping and caching as analyze_batch, for callers holding the
+        file bytes: nothing is base64-decoded, and each image that reaches
+        the model is sent as JPEG (non-JPEG uploads are re-encoded).
+
+        Args:
+            images (List[bytes]): Image file contents (JPEG, PNG, ...)
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens per image analysis
+
+        Returns:
+            List[Dict]: One analysis result per image, in input order
+
+        Raises:
+            Exception: If analysis fails
+        """
+        try:
+            logger.info(f"Starting batch analysis of {len(images)} raw images")
+            for image_bytes in images:
+                if not isinstance(image_bytes, (bytes, bytearray, memoryview)):
+                    raise ValueError("images must be bytes-like objects")
+                if detect_image_format(image_bytes) is None:
+                    raise ValueError("images must be supported images (JPEG, PNG, WebP, BMP, TIFF, GIF)")
+            return self._analyze_batch([(image_bytes, None) for image_bytes in images],
+                                       temperature, max_tokens)
+
+        except Exception as e:
+            logger.error(f"Batch analysis failed for raw image data: {str(e)}")
+            raise
+
+    def _analyze_batch(self, images: List[Tuple], temperature: float = None,
+                       max_tokens: int = None) -> List[Dict]:
+        """
+        Shared batch pipeline: cache lookups, CV pre-checks, grouped model calls.
+
+        Args:
+            images (List[Tuple]): (image_bytes, clean_base64) per image; the
+                                  base64 payload is built from image_bytes
+                                  (as JPEG) when None
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens per image analysis
+
+        Returns:
+            List[Dict]: One analysis result per image, in input order
+        """
+        temperature = temperature or self.DEFAULT_TEMPERATURE
+        max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
+
+        results: List[Optional[Dict]] = [None] * len(images)
+        pending = []  # (index, clean_base64, cache_key, cv_features)
+        for index, (image_bytes, clean_base64) in enumerate(images):
+            cache_key = _cache_key(image_bytes, temperature, max_tokens)
+            cached = _RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                results[index] = cached
+                continue
+            cv_features = self._extract_cv_features(image_bytes)
+            if self._is_non_leaf(cv_features):
+                results[index] = _RESULT_CACHE.put(cache_key, self._invalid_image_result(cv_features))
+                continue
+            if clean_base64 is None:
+                payload = self.image_analyzer.to_jpeg_bytes(image_bytes)
+                clean_base64 = base64.b64encode(payload).decode('ascii')
+            pending.append((index, clean_base64, cache_key, cv_features))
+
+        groups = [pending[start:start + self.MAX_BATCH_IMAGES]
+                  for start in range(0, len(pending), self.MAX_BATCH_IMAGES)]
+        if len(groups) > 1:
+            # Each group waits seconds on the model, so overlap them
+            with ThreadPoolExecutor(max_workers=min(len(groups), self.MAX_PARALLEL_GROUPS)) as pool:
+                analyzed = list(pool.map(
+                    lambda group: self._analyze_batch_group(group, temperature, max_tokens), groups))
+        else:
+            analyzed = [self._analyze_batch_group(group, temperature, max_tokens) for group in groups]
+
+        for group, group_results in zip(groups, analyzed):
+            for (index, _, cache_key, _), result in zip(group, group_results):
+                results[index] = _RESULT_CACHE.put(cache_key, result)
+
+        return results
+
+    def _analyze_batch_group(self, group: List[Tuple], temperature: float,
+                             max_tokens: int) -> List[Dict]:
+        """
+        Analyze one batch group with a single model request.
+
+        Args:
+            group (List[Tuple]): (index, clean_base64, cache_key, cv_features) per image
+            temperature (float): Model temperature for response generation
+            max_tokens (int): Maximum tokens per image analysis
+
+        Returns:
+            List[Dict]: One analysis result per image of the group, in order
+        """
+        request = self._build_batch_request(group, temperature, max_tokens)
+        logger.info(f"Sending request with {len(group)} images to AI model...")
+        response_content = self._stream_response(request, _JsonStreamCollector('[', ']'))
+        try:
+            analyses = self._parse_batch_response(response_content, len(group))
+        except ValueError as e:
+            logger.warning(f"Batch response unusable ({str(e)}), analyzing images one by one")
+            analyses = None
+
+        results = []
+        for position, (_, clean_base64, _, cv_features) in enumerate(group):
+            if analyses is None:
+                request = self._build_request(clean_base64, cv_features, temperature, max_tokens)
+                results.append(self._finalize_result(self._stream_response(request), cv_features))
+            else:
+                results.append(self._analysis_from_data(analyses[position], cv_features))
+        return results
+
+    def _build_batch_request(self, group: List[Tuple], temperature: float,
+                             max_tokens: int) -> Dict:
+        """
+        Build one chat request carrying every image of a batch group.
+
+        Args:
+            group (List[Tuple]): (index, clean_base64, cache_key, cv_features) per image
+            temperature (float): Model temperature for response generation
+            max_tokens (int): Maximum tokens per image analysis
+
+        Returns:
+            Dict: Keyword arguments for chat.completions.create
+        """
+        count = len(group)
+        contexts = []
+        for number, (_, _, _, cv_features) in enumerate(group, start=1):
+            summary = _feature_summary(cv_features)
+            if summary:
+                values = tuple(summary.get(key, 'N/A') for key in _SUMMARY_FIELDS)
+                contexts.append(f"\nIMAGE {number}:" + _feature_context(values))
+        prompt = (_BATCH_PROMPT_INTRO.format(count=count) + _PROMPT_HEAD + "".join(contexts)
+                  + _PROMPT_TAIL + _BATCH_PROMPT_OUTRO.format(count=count))
+
+        content = [{"type": "text", "text": prompt}]
+        content.extend({"type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{clean_base64}"}}
+                       for _, clean_base64, _, _ in group)
+        return {
+            "model": self.MODEL_NAME,
+            "messages": [{"role": "user", "content": content}],
+            "temperature": temperature,
+            "max_completion_tokens": max_tokens * count,
+            "top_p": 1,
+            "stream": True,
+            "stop": None,
+        }
+
+    def _parse_batch_response(self, response_content: str, count: int) -> List[Dict]:
+        """
+        Parse a multi-image response into one analysis object per image.
+
+        Args:
+            response_content (str): Raw response from API
+            count (int): Number of images in the request
+
+        Returns:
+            List[Dict]: Analysis objects in image order
+
+        Raises:
+            ValueError: If the response is not a JSON array of `count` objects
+        """
+        try:
+            analyses = orjson.loads(_FENCE_RE.sub('', response_content).strip())
+        except orjson.JSONDecodeError:
+            json_match = _JSON_ARRAY_RE.search(response_content)
+            if not json_match:
+                raise ValueError("no JSON array in response")
+            analyses = orjson.loads(json_match.group())
+
+        if (not isinstance(analyses, list) or len(analyses) != count
+                or not all(isinstance(analysis, dict) for analysis in analyses)):
+            raise ValueError(f"expected a JSON array of {count} analyses")
+        return analyses
+
+    def _parse_response(self, response_content: str, cv_features: Dict = None) -> DiseaseAnalysisResult:
+        """
+        Parse and validate API response into a DiseaseAnalysisResult.
+
+        Args:
+            response_content (str): Raw response from API
+            cv_features (Dict, optional): Computer vision extracted features
+
+        Returns:
+            DiseaseAnalysisResult: Parsed and validated results with feature analysis
+        """
+        return DiseaseAnalysisResult(**self._parse_response_dict(response_content, cv_features))
+
+    @staticmethod
+    def _result_dict(disease_data: Dict, feature_analysis: Dict) -> Dict:
+        """Validate required fields, laid out like DiseaseAnalysisResult."""
+        return {
+            "disease_detected": bool(disease_data.get('disease_detected', False)),
+            "disease_name": disease_data.get('disease_name'),
+            "disease_type": disease_data.get('disease_type', 'unknown'),
+            "severity": disease_data.get('severity', 'unknown'),
+            "confidence": float(disease_data.get('confidence', 0)),
+            "symptoms": disease_data.get('symptoms', []),
+            "possible_causes": disease_data.get('possible_causes', []),
+            "treatment": disease_data.get('treatment', []),
+            "analysis_timestamp": _timestamp(),
+            "feature_analysis": feature_analysis,
+            "farmer_recommendations": disease_data.get('farmer_recommendations', {})
+        }
+
+    def _analysis_from_data(self, disease_data: Dict, cv_features: Dict = None) -> Dict:
+        """
+        Merge one parsed model analysis with CV features into a result dict.
+
+        Args:
+            disease_data (Dict): Analysis object returned by the model
+            cv_features (Dict, optional): Computer vision extracted features
+
+        Returns:
+            Dict: Validated results with the same fields as DiseaseAnalysisResult
+        """
+        # Extract feature evaluation from AI response
+        ai_feature_evaluation = disease_data.get('feature_evaluation', {})
+        
+        # Merge AI evaluation with computer vision features
+        feature_analysis = {}
+        if cv_features:
+            # Combine CV features with AI evaluation
+            feature_analysis = {
+                "computer_vision_analysis": cv_features,
+                "ai_evaluation": ai_feature_evaluation,
+                "combined_analysis": _combine_features(cv_features, ai_feature_evaluation)
+            }
+        else:
+            # Use only AI evaluation if CV features not available
+            feature_analysis = {"ai_evaluation": ai_feature_evaluation}
+
+        # Validate required fields and build the result
+        return self._result_dict(disease_data, feature_analysis)
+
+    def _parse_response_dict(self, response_content: str, cv_features: Dict = None) -> Dict:
+        """
+        Parse and validate API response with comprehensive feature analysis
+
+        Args:
+            response_content (str): Raw response from API
+            cv_features (Dict, optional): Computer vision extracted features
+
+        Returns:
+            Dict: Parsed and validated results with feature analysis, with
+                  the same fields as DiseaseAnalysisResult
+        """
+        try:
+            # Clean up response - remove markdown code blocks if present
+            cleaned_response = _FENCE_RE.sub('', response_content).strip()
+
+            # Parse JSON
+            disease_data = orjson.loads(cleaned_response)
+            logger.info("Response parsed successfully as JSON")
+            return self._analysis_from_data(disease_data, cv_features)
+
+        except orjson.JSONDecodeError:
+            logger.warning(
+                "Failed to parse as JSON, attempting to extract JSON from response")
+
+            # Try to find JSON in the response using regex
+            json_match = _JSON_BLOCK_RE.search(response_content)
+            if json_match:
+                try:
+                    disease_data = orjson.loads(json_match.group())
+                    logger.info("JSON extracted and parsed successfully")
+                    return self._analysis_from_data(disease_data, cv_features)
+                except orjson.JSONDecodeError:
                     pass
 
             # If all parsing attempts fail, log the raw response and raise error
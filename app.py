@@ -1,85 +1,336 @@
 from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
-import numpy as np
-from utils import convert_image_to_base64_and_test, test_with_base64_data, translate_result
+import zlib
+import orjson
+try:
+    import msgpack
+except ImportError:  # msgpack responses are optional; JSON is always available
+    msgpack = None
+from utils import (decode_base64_image, detect_image_format, normalize_base64,
+                   test_with_image_bytes, test_with_image_batch, translate_result)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Leaf Disease Detection API", version="1.0.0")
+# Dedicated pool for the blocking detection pipeline. cv2/numpy release the
+# GIL and the model call is network-bound, so threads (not processes) suffice.
+DETECTION_WORKERS = int(os.getenv("DETECTION_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+EXECUTOR = ThreadPoolExecutor(max_workers=DETECTION_WORKERS, thread_name_prefix="detection")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    EXECUTOR.shutdown(wait=False, cancel_futures=True)
+
+
+def _json_default(obj):
+    """Fallback for NumPy values orjson rejects natively (non-contiguous or object arrays)"""
+    # Duck-typed so this module does not need numpy: scalars and arrays both
+    # expose tolist() (a scalar returns its Python value)
+    tolist = getattr(obj, "tolist", None)
+    if tolist is not None:
+        return tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class _ORJSONResponse(Response):
+    """JSON response rendered with orjson, NumPy values included"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+app = FastAPI(
+    title="Leaf Disease Detection API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=_ORJSONResponse
+)
+# feature_analysis makes results several KB of repetitive JSON; compress above 1 KB
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Uploads are pulled off the spooled temp file in 64 KB reads
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+# Most images accepted by /disease-detection-batch in one request
+MAX_BATCH_FILES = 10
+
+# Largest gzip-encoded JSON body expanded by /disease-detection-base64
+# (a 10 MB image is about 13.4 MB as base64)
+MAX_DECOMPRESSED_BODY = 16 * 1024 * 1024
+
+
+async def _read_upload(file: UploadFile) -> bytearray:
+    """Read an upload in UPLOAD_CHUNK_SIZE pieces into a buffer pre-sized to the file"""
+    # file.size is the exact part size from the multipart parser; chunks are
+    # copied into place, and slice assignment past the end grows the buffer
+    # if the size is unknown or understated
+    buffer = bytearray(file.size or 0)
+    offset = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    del buffer[offset:]
+    return buffer
+
+
+def _decode_body(body: bytes, content_encoding: str) -> bytes:
+    """
+    Undo a gzip Content-Encoding on a request body.
+
+    Args:
+        body: The raw request body
+        content_encoding: The request's Content-Encoding header value
+
+    Returns:
+        The decompressed body (all gzip members, concatenated), or body
+        itself when it is not encoded
+
+    Raises:
+        HTTPException: 415 for other encodings, 400 for corrupt or truncated
+            gzip data, 413 when the body expands past MAX_DECOMPRESSED_BODY
+    """
+    encoding = content_encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return body
+    if encoding != "gzip":
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {content_encoding}")
+    
+    # Bounded decompression so a small request cannot expand without limit;
+    # a gzip stream may hold several members (e.g. `cat a.gz b.gz`)
+    parts = []
+    remaining = MAX_DECOMPRESSED_BODY
+    while body:
+        if not remaining:
+            raise HTTPException(status_code=413, detail="Decompressed request body is too large")
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(body, remaining)
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Request body is not valid gzip data")
+        if decompressor.unconsumed_tail or (not decompressor.eof and len(data) == remaining):
+            raise HTTPException(status_code=413, detail="Decompressed request body is too large")
+        if not decompressor.eof:
+            raise HTTPException(status_code=400, detail="Request body is truncated gzip data")
+        parts.append(data)
+        remaining -= len(data)
+        body = decompressor.unused_data
+    return b"".join(parts)
+
+
+def _decode_base64_image(image: str) -> bytes:
+    """
+    Strictly decode a base64 image before any detection work is queued.
+
+    Args:
+        image: Base64 image data, optionally as a data URL or line-wrapped
+
+    Returns:
+        The decoded image file contents
+
+    Raises:
+        HTTPException: 400 if the data is not valid base64 or not a
+            supported image
+    """
+    try:
+        return decode_base64_image(normalize_base64(image))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"'image' is {e}")
+
+
+def _json_response(content) -> Response:
+    """Encode a result dict straight to JSON bytes, NumPy values included"""
+    return _ORJSONResponse(content)
+
+
+def _encode_response(content, accept: str) -> Response:
+    """Encode as MessagePack when the client asks for it, JSON otherwise"""
+    if msgpack is not None and "application/msgpack" in accept:
+        return Response(
+            content=msgpack.packb(content, default=_json_default, use_bin_type=True),
+            media_type="application/msgpack"
+        )
+    return _json_response(content)
+
+
+def _select_fields(result: dict, fields: Optional[str]) -> dict:
+    """
+    Keep only the requested parts of a detection result.
+
+    Args:
+        result: The detection result dictionary
+        fields: Comma-separated top-level keys, which may also name
+            feature_analysis branches (e.g. "combined_analysis") to keep
+            just those; None or empty keeps everything
+
+    Returns:
+        The result restricted to the requested fields
+    """
+    wanted = {field.strip() for field in fields.split(",")} if fields else set()
+    wanted.discard("")
+    if not wanted:
+        return result
+    
+    selected = {key: value for key, value in result.items() if key in wanted}
+    feature_analysis = result.get("feature_analysis")
+    if "feature_analysis" not in wanted and isinstance(feature_analysis, dict):
+        branches = {key: value for key, value in feature_analysis.items() if key in wanted}
+        if branches:
+            selected["feature_analysis"] = branches
+    return selected
+
+
+def _detection_response(request: Request, result: dict, language: Optional[str],
+                        fields: Optional[str] = None) -> Response:
+    """Translate a detection result if requested, select fields and encode it for the client"""
+    # Translate the result to the requested language
+    if language and language != 'en':
+        result = translate_result(result, language)
+        logger.debug("Result translated to %s", language)
+    
+    # Debug: Log if feature_analysis is present
+    if "feature_analysis" in result:
+        logger.debug("Feature analysis included: %d keys", len(result["feature_analysis"]))
+    else:
+        logger.warning("Feature analysis NOT found in result (keys: %s)", list(result))
+    
+    return _encode_response(_select_fields(result, fields), request.headers.get("accept", ""))
+
 
 @app.post('/disease-detection-file')
 async def disease_detection_file(
+    request: Request,
     file: UploadFile = File(...),
-    language: Optional[str] = Form('en')
+    language: Optional[str] = Form('en'),
+    fields: Optional[str] = None
 ):
     """
     Endpoint to detect diseases in leaf images using direct image file upload.
     Accepts multipart/form-data with an image file and optional language parameter.
+    An optional ?fields= query parameter limits the response to the listed keys.
+    Responds with JSON, or MessagePack when the Accept header asks for application/msgpack.
     """
     try:
-        logger.info(f"Received image file for disease detection (language: {language})")
+        logger.debug("Received image file for disease detection (language: %s)", language)
         
-        # Read uploaded file into memory
-        contents = await file.read()
-        logger.info(f"Read {len(contents)} bytes from uploaded file")
+        # Read uploaded file into memory in fixed-size chunks
+        contents = await _read_upload(file)
+        logger.debug("Read %d bytes from uploaded file", len(contents))
         
-    # Process file directly from memory
-        result = convert_image_to_base64_and_test(contents)
-        logger.info(f"Image processing completed. Result type: {type(result)}")
+        # Reject non-images from their magic bytes before queueing any work
+        if detect_image_format(contents) is None:
+            raise HTTPException(status_code=415, detail="Unsupported image format; expected JPEG, PNG, WebP, BMP, TIFF or GIF")
+        
+    # Process file directly from memory, off the event loop
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(EXECUTOR, test_with_image_bytes, contents)
+        logger.debug("Image processing completed. Result type: %s", type(result).__name__)
         
     # No cleanup needed since file is not saved locally
         
         if result is None:
             raise HTTPException(status_code=500, detail="Failed to process image file")
         
-        # Convert NumPy types to Python native types for JSON serialization
-        def convert_numpy_types(obj):
-            """Recursively convert NumPy types to native Python types"""
-            if isinstance(obj, (np.integer, np.intc, np.intp, np.int8,
-                               np.int16, np.int32, np.int64, np.uint8, np.uint16,
-                               np.uint32, np.uint64)):
-                return int(obj)
-            elif isinstance(obj, (np.floating, np.float16, np.float32, np.float64)):
-                return float(obj)
-            elif isinstance(obj, (np.bool_)):
-                return bool(obj)
-            elif isinstance(obj, np.ndarray):
-                return obj.tolist()
-            elif isinstance(obj, dict):
-                return {key: convert_numpy_types(value) for key, value in obj.items()}
-            elif isinstance(obj, (list, tuple)):
-                return [convert_numpy_types(item) for item in obj]
-            else:
-                return obj
+        response = _detection_response(request, result, language, fields)
+        logger.info("Disease detection from file completed successfully")
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in disease detection (file): %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post('/disease-detection-batch')
+async def disease_detection_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    language: Optional[str] = Form('en'),
+    fields: Optional[str] = None
+):
+    """
+    Endpoint to detect diseases in several leaf images uploaded together.
+    Accepts multipart/form-data with repeated 'files' parts; the images share
+    batched model requests. Responds with a list of results in upload order.
+    """
+    try:
+        if len(files) > MAX_BATCH_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} images per request")
+        
+        images = [await _read_upload(file) for file in files]
+        logger.debug("Read %d images for batch disease detection", len(images))
+        if any(detect_image_format(image) is None for image in images):
+            raise HTTPException(status_code=415, detail="Unsupported image format; expected JPEG, PNG, WebP, BMP, TIFF or GIF")
         
-        # Convert the result
-        result = convert_numpy_types(result)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(EXECUTOR, test_with_image_batch, images)
+        if results is None:
+            raise HTTPException(status_code=500, detail="Failed to process image files")
         
-        # Translate the result to the requested language
         if language and language != 'en':
-            result = translate_result(result, language)
-            logger.info(f"Result translated to {language}")
+            results = [translate_result(result, language) for result in results]
+        results = [_select_fields(result, fields) for result in results]
         
-        # Debug: Log if feature_analysis is present
-        if "feature_analysis" in result:
-            logger.info(f"Feature analysis included: {len(result.get('feature_analysis', {}))} keys")
-        else:
-            logger.warning("Feature analysis NOT found in result")
-            logger.info(f"Result keys: {list(result.keys())}")
+        logger.info("Batch disease detection completed for %d images", len(results))
+        return _encode_response(results, request.headers.get("accept", ""))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in disease detection (batch): %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post('/disease-detection-base64')
+async def disease_detection_base64(request: Request, fields: Optional[str] = None):
+    """
+    Endpoint to detect diseases in base64 encoded leaf images.
+    Accepts a JSON body {"image": "<base64 or data URL>", "language": "en"}, skipping
+    multipart parsing for clients that already hold base64 data. The body may be
+    sent gzip-compressed with Content-Encoding: gzip.
+    Responds like /disease-detection-file.
+    """
+    try:
+        # Decompression and base64 decoding scale with the body size, so
+        # both run in the pool instead of stalling the event loop
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(EXECUTOR, _decode_body, await request.body(),
+                                          request.headers.get("content-encoding", ""))
+        try:
+            body = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Request body must be valid JSON")
         
-        logger.info("Disease detection from file completed successfully")
-        return JSONResponse(content=result)
+        image = body.get("image") if isinstance(body, dict) else None
+        if not isinstance(image, str) or not image:
+            raise HTTPException(status_code=400, detail="'image' must be a non-empty base64 string")
+        language = body.get("language") or 'en'
+        logger.debug("Received base64 image for disease detection (language: %s)", language)
+        
+        # Malformed data is a client error, so reject it before queueing;
+        # the decoded bytes then take the same path as a file upload
+        contents = await loop.run_in_executor(EXECUTOR, _decode_base64_image, image)
+        result = await loop.run_in_executor(EXECUTOR, test_with_image_bytes, contents)
+        
+        if result is None:
+            raise HTTPException(status_code=500, detail="Failed to process base64 image")
+        
+        response = _detection_response(request, result, language, fields)
+        logger.info("Disease detection from base64 completed successfully")
+        return response
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        logger.error(f"Error in disease detection (file): {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Error in disease detection (base64): %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
@@ -90,6 +341,8 @@ async def root():
         "message": "Leaf Disease Detection API",
         "version": "1.0.0",
         "endpoints": {
-            "disease_detection_file": "/disease-detection-file (POST, file upload)"
+            "disease_detection_file": "/disease-detection-file (POST, file upload)",
+            "disease_detection_batch": "/disease-detection-batch (POST, multiple file uploads)",
+            "disease_detection_base64": "/disease-detection-base64 (POST, JSON {\"image\": base64})"
         }
     }
@@ -1,10 +1,19 @@
 
 
-import streamlit as st
-import requests
+import hashlib
+import io
+import re
+import time
+from html import escape
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+import orjson
 import streamlit as st
 import requests
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Set Streamlit theme to light and wide mode
 st.set_page_config(
@@ -14,434 +23,451 @@ st.set_page_config(
 )
 
 
-# Enhanced modern CSS
-st.markdown("""
-    <style>
-    .stApp {
-        background: linear-gradient(135deg, #e3f2fd 0%, #f7f9fa 100%);
-    }
-    .result-card {
-        background: rgba(255,255,255,0.95);
-        border-radius: 18px;
-        box-shadow: 0 4px 24px rgba(44,62,80,0.10);
-        padding: 2.5em 2em;
-        margin-top: 1.5em;
-        margin-bottom: 1.5em;
-        transition: box-shadow 0.3s;
-    }
-    .result-card:hover {
-        box-shadow: 0 8px 32px rgba(44,62,80,0.18);
-    }
-    .disease-title {
-        color: #1b5e20;
-        font-size: 2.2em;
-        font-weight: 700;
-        margin-bottom: 0.5em;
-        letter-spacing: 1px;
-        text-shadow: 0 2px 8px #e0e0e0;
-    }
-    .section-title {
-        color: #1976d2;
-        font-size: 1.25em;
-        margin-top: 1.2em;
-        margin-bottom: 0.5em;
-        font-weight: 600;
-        letter-spacing: 0.5px;
-    }
-    .timestamp {
-        color: #616161;
-        font-size: 0.95em;
-        margin-top: 1.2em;
-        text-align: right;
-    }
-    .info-badge {
-        display: inline-block;
-        background: #e3f2fd;
-        color: #1976d2;
-        border-radius: 8px;
-        padding: 0.3em 0.8em;
-        font-size: 1em;
-        margin-right: 0.5em;
-        margin-bottom: 0.3em;
-    }
-    .symptom-list, .cause-list, .treatment-list {
-        margin-left: 1em;
-        margin-bottom: 0.5em;
-    }
-    .feature-card {
-        background: rgba(255,255,255,0.9);
-        border-left: 4px solid #1976d2;
-        border-radius: 8px;
-        padding: 1em;
-        margin: 0.5em 0;
-    }
-    .feature-title {
-        color: #1976d2;
-        font-size: 1.1em;
-        font-weight: 600;
-        margin-bottom: 0.3em;
-    }
-    .feature-value {
-        color: #424242;
-        font-size: 0.95em;
-        margin-left: 1em;
-    }
-    .health-status {
-        font-size: 1.3em;
-        font-weight: 700;
-        padding: 0.5em;
-        border-radius: 8px;
-        text-align: center;
-        margin: 1em 0;
-    }
-    .health-healthy {
-        background: #e8f5e9;
-        color: #2e7d32;
-    }
-    .health-mild {
-        background: #fff3e0;
-        color: #f57c00;
-    }
-    .health-severe {
-        background: #ffebee;
-        color: #c62828;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-
-st.markdown("""
+# Enhanced modern CSS from styles.css, minified once at import since it is
+# re-sent on every rerun (Streamlit drops elements a rerun does not emit, so
+# it can't be skipped)
+_CSS = Path(__file__).with_name("styles.css").read_text(encoding="utf-8")
+_CSS = "<style>" + re.sub(r"\s*([{};:,>])\s*", r"\1", re.sub(r"\s+", " ", _CSS)).strip() + "</style>"
+
+_HEADER_HTML = """
     <div style='text-align: center; margin-top: 1em;'>
         <span style='font-size:2.5em;'>🌿</span>
         <h1 style='color: #1565c0; margin-bottom:0;'>Leaf Disease Detection</h1>
         <p style='color: #616161; font-size:1.15em;'>Upload a leaf image to detect diseases and get expert recommendations.</p>
     </div>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_CSS, unsafe_allow_html=True)
+st.markdown(_HEADER_HTML, unsafe_allow_html=True)
+
+api_url = "https://leaf-diseases-detect.vercel.app"
+
+# (connect, read) timeouts for API calls; the read side covers model inference
+API_TIMEOUT = (3.05, 60)
+
+# Result keys the page renders, sent as ?fields= so the API leaves out the
+# computer-vision branch of feature_analysis (already merged into
+# combined_analysis); ai_evaluation stays as the fallback when there is none
+RESULT_FIELDS = ",".join((
+    "disease_detected", "disease_name", "disease_type", "severity", "confidence",
+    "symptoms", "possible_causes", "treatment", "analysis_timestamp",
+    "combined_analysis", "ai_evaluation",
+))
+
+# Images per /disease-detection-batch request (the API's upper limit)
+MAX_BATCH_FILES = 10
+
+# Photos above MIN_RESIZE_BYTES are sent downscaled to MAX_UPLOAD_SIDE pixels
+MAX_UPLOAD_SIDE = 1024
+MIN_RESIZE_BYTES = 256 * 1024
+
+# Longest side of the upload previews shown beside the results
+PREVIEW_SIDE = 512
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """HTTP session shared across reruns so detections reuse a kept-alive connection"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                          max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_pool() -> ThreadPoolExecutor:
+    """Worker threads running API calls off the Streamlit script thread"""
+    return ThreadPoolExecutor(max_workers=4)
+
+
+class APIError(Exception):
+    """Non-200 response from the detection API (raised so it is never cached)"""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"API Error: {status_code}")
+        self.status_code = status_code
+        self.text = text
+
+
+@st.cache_data(max_entries=128, ttl=3600, show_spinner=False)
+def detect(image_digest: str, _file_bytes: bytes, _filename: str, _mime: str) -> dict:
+    """
+    POST an image to the detection API, memoized by image content.
+
+    Only image_digest is part of the cache key; the underscore-prefixed
+    arguments are skipped by Streamlit's hasher.
+    """
+    files = {"file": (_filename, _file_bytes, _mime)}
+    response = get_session().post(
+        f"{api_url}/disease-detection-file", params={"fields": RESULT_FIELDS},
+        files=files, timeout=API_TIMEOUT)
+    if response.status_code != 200:
+        raise APIError(response.status_code, response.text)
+    return orjson.loads(response.content)
+
+
+@st.cache_data(max_entries=32, ttl=3600, show_spinner=False)
+def detect_batch(image_digests: tuple, _uploads: list) -> list:
+    """
+    POST several images in one multipart request, memoized by their contents.
+
+    _uploads holds one (filename, bytes, mime) tuple per image. Servers
+    without the batch endpoint get one detect() call per image instead.
+    """
+    files = [("files", upload) for upload in _uploads]
+    response = get_session().post(
+        f"{api_url}/disease-detection-batch", params={"fields": RESULT_FIELDS},
+        files=files, timeout=API_TIMEOUT)
+    if response.status_code == 404:
+        return [detect(digest, *upload) for digest, upload in zip(image_digests, _uploads)]
+    if response.status_code != 200:
+        raise APIError(response.status_code, response.text)
+    return orjson.loads(response.content)
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def shrink_image(image_digest: str, _data: bytes) -> bytes:
+    """
+    Downscale a large photo to MAX_UPLOAD_SIDE and re-encode it as JPEG.
+
+    Returns the original bytes when the image is small, unreadable, or
+    would not get any smaller.
+    """
+    if len(_data) < MIN_RESIZE_BYTES:
+        return _data
+    try:
+        with Image.open(io.BytesIO(_data)) as img:
+            # Apply the EXIF rotation now, since re-encoding drops the tag
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((MAX_UPLOAD_SIDE, MAX_UPLOAD_SIDE), Image.LANCZOS)
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True)
+    except OSError:
+        return _data
+    shrunk = buffer.getvalue()
+    return shrunk if len(shrunk) < len(_data) else _data
+
+
+def _make_preview(data: bytes) -> bytes:
+    """Small JPEG preview of an upload (the original bytes if it can't be decoded)"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((PREVIEW_SIDE, PREVIEW_SIDE))
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, "JPEG", quality=80)
+    except OSError:
+        return data
+    return buffer.getvalue()
+
+
+def upload_entries(uploaded_files: list) -> list:
+    """
+    Bytes, content digest and preview of each upload, computed once per file_id.
+
+    Entries live in session_state, so reruns skip re-reading, re-hashing and
+    re-decoding files that are still in the uploader; removed files are dropped.
+    """
+    cached = st.session_state.get("uploads", {})
+    entries = {}
+    for uploaded_file in uploaded_files:
+        entry = cached.get(uploaded_file.file_id)
+        if entry is None:
+            data = uploaded_file.getvalue()
+            entry = {"data": data,
+                     "digest": hashlib.blake2b(data, digest_size=16).hexdigest(),
+                     "preview": _make_preview(data)}
+        entries[uploaded_file.file_id] = entry
+    st.session_state["uploads"] = entries
+    return [entries[uploaded_file.file_id] for uploaded_file in uploaded_files]
+
+
+def _prepare_upload(uploaded_file, entry: dict) -> tuple:
+    """(filename, bytes, mime) multipart tuple, downscaled when worthwhile"""
+    data = entry["data"]
+    shrunk = shrink_image(entry["digest"], data)
+    # shrink_image only ever returns smaller bytes when it re-encoded
+    return uploaded_file.name, shrunk, "image/jpeg" if len(shrunk) < len(data) else uploaded_file.type
+
+
+def detect_files(uploaded_files: list, entries: list) -> list:
+    """Detect every uploaded file, batching them into one request when there are several"""
+    # Keys hash the original upload; shrink_image is memoized on them too
+    digests = tuple(entry["digest"] for entry in entries)
+    uploads = [_prepare_upload(f, entry) for f, entry in zip(uploaded_files, entries)]
+    if len(uploads) == 1:
+        return [detect(digests[0], *uploads[0])]
+    results = []
+    for start in range(0, len(uploads), MAX_BATCH_FILES):
+        end = start + MAX_BATCH_FILES
+        results.extend(detect_batch(digests[start:end], uploads[start:end]))
+    return results
+
+
+# Detail line display tests: field present (not None), truthy, or unconditional
+_SET, _TRUTHY, _ALWAYS = "set", "truthy", "always"
+
+# One entry per analysed feature, in display order:
+# (expander title, result key, status label, status fields tried in order,
+#  detail lines as (field, format_map template over the feature's dict, test,
+#  diseased-leaf only), expanded)
+FEATURE_SPECS = (
+    ("1️⃣ Leaf Color (Most Important)", "1_leaf_color", "Color Assessment", ("color_status", "assessment"), (
+        ("green_intensity", "<div class='feature-value'>Green Intensity: {green_intensity:.1f}</div>", _TRUTHY, False),
+        ("yellowing_percentage", "<div class='feature-value'>Yellowing: {yellowing_percentage:.1f}%</div>", _SET, True),
+        ("pale_percentage", "<div class='feature-value'>Pale Areas: {pale_percentage:.1f}%</div>", _SET, True),
+    ), True),
+    ("2️⃣ Color Uniformity", "2_color_uniformity", "Uniformity Status", ("uniformity_status", "assessment"), (
+        ("patchiness_percentage", "<div class='feature-value'>Patchiness: {patchiness_percentage:.1f}%</div>", _SET, True),
+    ), False),
+    ("3️⃣ Leaf Texture", "3_leaf_texture", "Texture Status", ("texture_status", "assessment"), (
+        ("roughness_percentage", "<div class='feature-value'>Roughness: {roughness_percentage:.1f}%</div>", _SET, True),
+    ), False),
+    ("4️⃣ Spots / Lesions / Discoloration", "4_spots_lesions_discoloration", "Lesion Status", ("lesion_status", "assessment"), (
+        ("brown_spots_percentage", "<div class='feature-value'>Brown Spots: {brown_spots_percentage:.1f}%</div>", _SET, True),
+        ("white_patches_percentage", "<div class='feature-value'>White Patches: {white_patches_percentage:.1f}%</div>", _SET, True),
+        ("black_lesions_percentage", "<div class='feature-value'>Black Lesions: {black_lesions_percentage:.1f}%</div>", _SET, True),
+    ), False),
+    ("5️⃣ Leaf Shape & Deformation", "5_leaf_shape_deformation", "Shape Status", ("shape_status", "assessment"), (
+        ("deformation_type", "<div class='feature-value'>Deformation Type: {deformation_type}</div>", _TRUTHY, True),
+    ), False),
+    ("6️⃣ Leaf Edge (Margin) Condition", "6_leaf_edge_condition", "Edge Status", ("edge_status", "assessment"), (
+        ("burnt_edges_percentage", "<div class='feature-value'>Burnt Edges: {burnt_edges_percentage:.1f}%</div>", _SET, True),
+        ("yellow_edges_percentage", "<div class='feature-value'>Yellow Edges: {yellow_edges_percentage:.1f}%</div>", _SET, True),
+    ), False),
+    ("7️⃣ Leaf Size & Area", "7_leaf_size_area", "Size Status", ("size_status", "assessment"), (
+        ("leaf_area_percentage", "<div class='feature-value'>Leaf Area: {leaf_area_percentage:.1f}% of image</div>", _SET, True),
+    ), False),
+    ("8️⃣ Vein Color & Visibility", "8_vein_color_visibility", "Vein Status", ("vein_status", "assessment"), (
+        ("iron_deficiency_indicator", "<div class='feature-value' style='color: #f57c00; font-weight: 600;'>⚠️ Iron Deficiency Indicator Detected</div>", _TRUTHY, True),
+    ), False),
+    ("9️⃣ Glossiness / Dullness", "9_glossiness_dullness", "Surface Quality", ("glossiness_status", "assessment"), (), False),
+    ("1️⃣0️⃣ Stress Indicators (Overall Health)", "10_stress_indicators", "Overall Health", ("health_status", "overall_assessment"), (
+        ("stress_score", "<div class='feature-value'>Stress Score: {stress_score:.2f} (0 = Healthy, 1 = Severe Stress)</div>", _SET, True),
+    ), False),
+    ("1️⃣1️⃣ Chlorophyll Index (Advanced)", "11_chlorophyll_index", "Chlorophyll Status", ("chlorophyll_status", "assessment"), (
+        ("estimated_nitrogen_level", "<div class='feature-value'>Estimated Nitrogen Level: {estimated_nitrogen_level}</div>", _TRUTHY, True),
+    ), False),
+    ("1️⃣2️⃣ Leaf pH Proxy (Advanced)", "12_ph_proxy", "pH Estimate", ("ph_estimate",), (
+        (None, "<div class='feature-value' style='font-size: 0.85em; color: #757575;'>(Indirect estimation based on visual indicators)</div>", _ALWAYS, True),
+    ), False),
+)
 
-api_url = "http://leaf-diseases-detect.vercel.app"
+# Feature card showing the assessed status of one feature: (label, status)
+_STATUS_CARD = ("<div class='feature-card'><div class='feature-title'>%s:</div>"
+                "<div class='feature-value'>%s</div></div>")
+
+# Strips ":.1f"-style format specs from a template's replacement fields
+_FORMAT_SPEC = re.compile(r"\{(\w+):[^}]*\}")
+
+
+# Health badge class by the status' leading emoji, with word fallbacks
+# checked in priority order for statuses without one
+_HEALTH_CLASS_BY_EMOJI = {"🟢": "health-healthy", "🟡": "health-mild", "🔴": "health-severe"}
+_HEALTH_CLASS_BY_WORD = (("Healthy", "health-healthy"), ("Mild", "health-mild"), ("Severe", "health-severe"))
+
+
+def _health_class(health_status) -> str:
+    """CSS class for the overall health badge"""
+    status = str(health_status)
+    css_class = _HEALTH_CLASS_BY_EMOJI.get(status[:1])
+    if css_class:
+        return css_class
+    for emoji, css_class in _HEALTH_CLASS_BY_EMOJI.items():
+        if emoji in status:
+            return css_class
+    for word, css_class in _HEALTH_CLASS_BY_WORD:
+        if word in status:
+            return css_class
+    return "health-healthy"
+
+
+def _text(value) -> str:
+    """
+    HTML-escape a value from the API response.
+
+    Results are shown with unsafe_allow_html, so model-written strings must
+    not be able to inject markup or scripts into the page.
+    """
+    return escape(str(value))
+
+
+def _list_html(title: str, css_class: str, items: list) -> str:
+    """Section title followed by a bulleted list"""
+    return (f"<div class='section-title'>{title}</div><ul class='{css_class}'>"
+            + "".join(f"<li>{_text(item)}</li>" for item in items) + "</ul>")
+
+
+def _feature_html(title: str, body: str, expanded: bool = False) -> str:
+    """One collapsible feature section (a <details> block in place of st.expander)"""
+    return f"<details class='feature-expander'{' open' if expanded else ''}><summary>{title}</summary>{body}</details>"
+
+
+def _feature_analysis_html(feature_analysis: dict, detailed: bool) -> str:
+    """
+    Render the 12-feature analysis; detailed adds the measured values
+    (shown for diseased leaves, omitted for healthy ones).
+    """
+    parts = ["<hr style='margin: 2em 0; border: 1px solid #e0e0e0;'>",
+             "<div class='section-title' style='font-size: 1.5em; color: #1565c0;'>📊 Comprehensive Leaf Analysis</div>"]
+
+    # Get combined analysis or AI evaluation
+    combined = feature_analysis.get("combined_analysis", {})
+    if not combined:
+        combined = feature_analysis.get("ai_evaluation", {})
+    if not combined:
+        combined = feature_analysis.get("computer_vision_analysis", {})
+
+    # Overall Health Status (Feature #10)
+    stress_indicators = combined.get("10_stress_indicators", {})
+    if stress_indicators:
+        health_status = stress_indicators.get("health_status", stress_indicators.get("overall_assessment", "N/A"))
+        parts.append(f"<div class='health-status {_health_class(health_status)}'>{_text(health_status)}</div>")
+
+    for title, key, label, status_fields, details, expanded in FEATURE_SPECS:
+        data = combined.get(key)
+        # Features the analysis did not report get no section at all
+        if not data:
+            continue
+        status = next((data[field] for field in status_fields if field in data), 'N/A')
+        body = _STATUS_CARD % (label, _text(status))
+        values = None
+        for field, template, test, detailed_only in details:
+            if detailed_only and not detailed:
+                continue
+            value = data.get(field)
+            if test == _ALWAYS or (test == _SET and value is not None) or (test == _TRUTHY and value):
+                if values is None:
+                    values = {name: _text(val) if isinstance(val, str) else val for name, val in data.items()}
+                try:
+                    body += template.format_map(values)
+                except ValueError:
+                    # AI evaluations report levels ("high/moderate/low") where the
+                    # CV analysis has numbers; show those without the number format
+                    body += _FORMAT_SPEC.sub(r"{\1}", template).format_map(values)
+        parts.append(_feature_html(title, body, expanded))
+
+    return "".join(parts)
+
+
+def render_result(result: dict) -> str:
+    """
+    Build the whole result card as one HTML string.
+
+    Emitting it with a single st.markdown sends one element to the
+    browser instead of dozens of separate markdown deltas.
+    """
+    parts = ["<div class='result-card'>"]
+
+    # Check if it's an invalid image
+    if result.get("disease_type") == "invalid_image":
+        parts.append("<div class='disease-title'>⚠️ Invalid Image</div>")
+        parts.append("<div style='color: #ff5722; font-size: 1.1em; margin-bottom: 1em;'>Please upload a clear image of a plant leaf for accurate disease detection.</div>")
+
+        # Show the symptoms (which contain the error message)
+        if result.get("symptoms"):
+            parts.append(_list_html("Issue", "symptom-list", result.get("symptoms", [])))
+
+        # Show treatment recommendations
+        if result.get("treatment"):
+            parts.append(_list_html("What to do", "treatment-list", result.get("treatment", [])))
+
+        parts.append("</div>")
+        return "".join(parts)
+
+    if result.get("disease_detected"):
+        parts.append(f"<div class='disease-title'>🦠 {_text(result.get('disease_name', 'N/A'))}</div>")
+        parts.append(f"<span class='info-badge'>Type: {_text(result.get('disease_type', 'N/A'))}</span>")
+        parts.append(f"<span class='info-badge'>Severity: {_text(result.get('severity', 'N/A'))}</span>")
+        parts.append(f"<span class='info-badge'>Confidence: {_text(result.get('confidence', 'N/A'))}%</span>")
+        parts.append(_list_html("Symptoms", "symptom-list", result.get("symptoms", [])))
+        parts.append(_list_html("Possible Causes", "cause-list", result.get("possible_causes", [])))
+        parts.append(_list_html("Treatment", "treatment-list", result.get("treatment", [])))
+    else:
+        # Healthy leaf case
+        parts.append("<div class='disease-title'>✅ Healthy Leaf</div>")
+        parts.append("<div style='color: #4caf50; font-size: 1.1em; margin-bottom: 1em;'>No disease detected in this leaf. The plant appears to be healthy!</div>")
+        parts.append(f"<span class='info-badge'>Status: {_text(result.get('disease_type', 'healthy'))}</span>")
+        parts.append(f"<span class='info-badge'>Confidence: {_text(result.get('confidence', 'N/A'))}%</span>")
+
+    # Display Comprehensive Feature Analysis (measured values only for diseased leaves)
+    feature_analysis = result.get("feature_analysis", {})
+    if feature_analysis:
+        parts.append(_feature_analysis_html(feature_analysis, detailed=bool(result.get("disease_detected"))))
+
+    parts.append(f"<div class='timestamp'>🕒 {_text(result.get('analysis_timestamp', 'N/A'))}</div>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def _rendered_results(future) -> list:
+    """
+    Result-card HTML for a finished detection.
+
+    Rendered once per detection and kept in session_state, so reruns from
+    unrelated widget interactions only re-send the stored strings.
+    """
+    rendered_for, html = st.session_state.get("rendered", (None, None))
+    if rendered_for is not future:
+        html = [render_result(result) for result in future.result()]
+        st.session_state["rendered"] = (future, html)
+    return html
+
+
+def _warm_up():
+    """Touch the API so a cold serverless instance starts while the user uploads"""
+    try:
+        get_session().get(f"{api_url}/", timeout=5)
+    except requests.RequestException:
+        pass
+
+
+# Once per browser session, off the script thread; this also opens the
+# kept-alive connection the first detection will reuse
+if not st.session_state.get("warmed_up"):
+    get_pool().submit(_warm_up)
+    st.session_state["warmed_up"] = True
 
 col1, col2 = st.columns([1, 2])
 with col1:
-    uploaded_file = st.file_uploader(
-        "Upload Leaf Image", type=["jpg", "jpeg", "png"])
-    if uploaded_file is not None:
-        st.image(uploaded_file, caption="Preview")
+    uploaded_files = st.file_uploader(
+        "Upload Leaf Images", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
+    entries = upload_entries(uploaded_files or [])
+    for uploaded_file, entry in zip(uploaded_files or [], entries):
+        st.image(entry["preview"], caption=uploaded_file.name)
 
 with col2:
-    if uploaded_file is not None:
+    if uploaded_files:
+        file_ids = tuple(f.file_id for f in uploaded_files)
         if st.button("🔍 Detect Disease", use_container_width=True):
-            with st.spinner("Analyzing image and contacting API..."):
-                try:
-                    files = {
-                        "file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                    response = requests.post(
-                        f"{api_url}/disease-detection-file", files=files)
-                    if response.status_code == 200:
-                        result = response.json()
-
-                        # Check if it's an invalid image
-                        if result.get("disease_type") == "invalid_image":
-                            st.markdown("<div class='result-card'>",
-                                        unsafe_allow_html=True)
-                            st.markdown(
-                                "<div class='disease-title'>⚠️ Invalid Image</div>", unsafe_allow_html=True)
-                            st.markdown(
-                                "<div style='color: #ff5722; font-size: 1.1em; margin-bottom: 1em;'>Please upload a clear image of a plant leaf for accurate disease detection.</div>", unsafe_allow_html=True)
-
-                            # Show the symptoms (which contain the error message)
-                            if result.get("symptoms"):
-                                st.markdown(
-                                    "<div class='section-title'>Issue</div>", unsafe_allow_html=True)
-                                st.markdown("<ul class='symptom-list'>",
-                                            unsafe_allow_html=True)
-                                for symptom in result.get("symptoms", []):
-                                    st.markdown(
-                                        f"<li>{symptom}</li>", unsafe_allow_html=True)
-                                st.markdown("</ul>", unsafe_allow_html=True)
-
-                            # Show treatment recommendations
-                            if result.get("treatment"):
-                                st.markdown(
-                                    "<div class='section-title'>What to do</div>", unsafe_allow_html=True)
-                                st.markdown("<ul class='treatment-list'>",
-                                            unsafe_allow_html=True)
-                                for treat in result.get("treatment", []):
-                                    st.markdown(
-                                        f"<li>{treat}</li>", unsafe_allow_html=True)
-                                st.markdown("</ul>", unsafe_allow_html=True)
-
-                            st.markdown("</div>", unsafe_allow_html=True)
-
-                        elif result.get("disease_detected"):
-                            st.markdown("<div class='result-card'>",
-                                        unsafe_allow_html=True)
-                            st.markdown(
-                                f"<div class='disease-title'>🦠 {result.get('disease_name', 'N/A')}</div>", unsafe_allow_html=True)
-                            st.markdown(
-                                f"<span class='info-badge'>Type: {result.get('disease_type', 'N/A')}</span>", unsafe_allow_html=True)
-                            st.markdown(
-                                f"<span class='info-badge'>Severity: {result.get('severity', 'N/A')}</span>", unsafe_allow_html=True)
-                            st.markdown(
-                                f"<span class='info-badge'>Confidence: {result.get('confidence', 'N/A')}%</span>", unsafe_allow_html=True)
-                            st.markdown(
-                                "<div class='section-title'>Symptoms</div>", unsafe_allow_html=True)
-                            st.markdown("<ul class='symptom-list'>",
-                                        unsafe_allow_html=True)
-                            for symptom in result.get("symptoms", []):
-                                st.markdown(
-                                    f"<li>{symptom}</li>", unsafe_allow_html=True)
-                            st.markdown("</ul>", unsafe_allow_html=True)
-                            st.markdown(
-                                "<div class='section-title'>Possible Causes</div>", unsafe_allow_html=True)
-                            st.markdown("<ul class='cause-list'>",
-                                        unsafe_allow_html=True)
-                            for cause in result.get("possible_causes", []):
-                                st.markdown(
-                                    f"<li>{cause}</li>", unsafe_allow_html=True)
-                            st.markdown("</ul>", unsafe_allow_html=True)
-                            st.markdown(
-                                "<div class='section-title'>Treatment</div>", unsafe_allow_html=True)
-                            st.markdown("<ul class='treatment-list'>",
-                                        unsafe_allow_html=True)
-                            for treat in result.get("treatment", []):
-                                st.markdown(
-                                    f"<li>{treat}</li>", unsafe_allow_html=True)
-                            st.markdown("</ul>", unsafe_allow_html=True)
-                            
-                            # Display Comprehensive Feature Analysis
-                            feature_analysis = result.get("feature_analysis", {})
-                            if feature_analysis:
-                                st.markdown("<hr style='margin: 2em 0; border: 1px solid #e0e0e0;'>", unsafe_allow_html=True)
-                                st.markdown(
-                                    "<div class='section-title' style='font-size: 1.5em; color: #1565c0;'>📊 Comprehensive Leaf Analysis</div>", unsafe_allow_html=True)
-                                
-                                # Get combined analysis or AI evaluation
-                                combined = feature_analysis.get("combined_analysis", {})
-                                if not combined:
-                                    combined = feature_analysis.get("ai_evaluation", {})
-                                if not combined:
-                                    combined = feature_analysis.get("computer_vision_analysis", {})
-                                
-                                # Overall Health Status (Feature #10)
-                                stress_indicators = combined.get("10_stress_indicators", {})
-                                if stress_indicators:
-                                    health_status = stress_indicators.get("health_status", stress_indicators.get("overall_assessment", "N/A"))
-                                    if "🟢" in str(health_status) or "Healthy" in str(health_status):
-                                        health_class = "health-healthy"
-                                    elif "🟡" in str(health_status) or "Mild" in str(health_status):
-                                        health_class = "health-mild"
-                                    elif "🔴" in str(health_status) or "Severe" in str(health_status):
-                                        health_class = "health-severe"
-                                    else:
-                                        health_class = "health-healthy"
-                                    st.markdown(
-                                        f"<div class='health-status {health_class}'>{health_status}</div>", unsafe_allow_html=True)
-                                
-                                # Create expandable sections for features
-                                with st.expander("1️⃣ Leaf Color (Most Important)", expanded=True):
-                                    color_data = combined.get("1_leaf_color", {})
-                                    if color_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Color Assessment:</div><div class='feature-value'>{color_data.get('color_status', color_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if color_data.get('green_intensity'):
-                                            st.markdown(f"<div class='feature-value'>Green Intensity: {color_data.get('green_intensity', 0):.1f}</div>", unsafe_allow_html=True)
-                                        if color_data.get('yellowing_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Yellowing: {color_data.get('yellowing_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                        if color_data.get('pale_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Pale Areas: {color_data.get('pale_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("2️⃣ Color Uniformity"):
-                                    uniformity_data = combined.get("2_color_uniformity", {})
-                                    if uniformity_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Uniformity Status:</div><div class='feature-value'>{uniformity_data.get('uniformity_status', uniformity_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if uniformity_data.get('patchiness_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Patchiness: {uniformity_data.get('patchiness_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("3️⃣ Leaf Texture"):
-                                    texture_data = combined.get("3_leaf_texture", {})
-                                    if texture_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Texture Status:</div><div class='feature-value'>{texture_data.get('texture_status', texture_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if texture_data.get('roughness_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Roughness: {texture_data.get('roughness_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("4️⃣ Spots / Lesions / Discoloration"):
-                                    lesions_data = combined.get("4_spots_lesions_discoloration", {})
-                                    if lesions_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Lesion Status:</div><div class='feature-value'>{lesions_data.get('lesion_status', lesions_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if lesions_data.get('brown_spots_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Brown Spots: {lesions_data.get('brown_spots_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                        if lesions_data.get('white_patches_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>White Patches: {lesions_data.get('white_patches_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                        if lesions_data.get('black_lesions_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Black Lesions: {lesions_data.get('black_lesions_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("5️⃣ Leaf Shape & Deformation"):
-                                    shape_data = combined.get("5_leaf_shape_deformation", {})
-                                    if shape_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Shape Status:</div><div class='feature-value'>{shape_data.get('shape_status', shape_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if shape_data.get('deformation_type'):
-                                            st.markdown(f"<div class='feature-value'>Deformation Type: {shape_data.get('deformation_type', 'None')}</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("6️⃣ Leaf Edge (Margin) Condition"):
-                                    edge_data = combined.get("6_leaf_edge_condition", {})
-                                    if edge_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Edge Status:</div><div class='feature-value'>{edge_data.get('edge_status', edge_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if edge_data.get('burnt_edges_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Burnt Edges: {edge_data.get('burnt_edges_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                        if edge_data.get('yellow_edges_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Yellow Edges: {edge_data.get('yellow_edges_percentage', 0):.1f}%</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("7️⃣ Leaf Size & Area"):
-                                    size_data = combined.get("7_leaf_size_area", {})
-                                    if size_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Size Status:</div><div class='feature-value'>{size_data.get('size_status', size_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if size_data.get('leaf_area_percentage') is not None:
-                                            st.markdown(f"<div class='feature-value'>Leaf Area: {size_data.get('leaf_area_percentage', 0):.1f}% of image</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("8️⃣ Vein Color & Visibility"):
-                                    vein_data = combined.get("8_vein_color_visibility", {})
-                                    if vein_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Vein Status:</div><div class='feature-value'>{vein_data.get('vein_status', vein_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if vein_data.get('iron_deficiency_indicator'):
-                                            st.markdown(f"<div class='feature-value' style='color: #f57c00; font-weight: 600;'>⚠️ Iron Deficiency Indicator Detected</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("9️⃣ Glossiness / Dullness"):
-                                    gloss_data = combined.get("9_glossiness_dullness", {})
-                                    if gloss_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Surface Quality:</div><div class='feature-value'>{gloss_data.get('glossiness_status', gloss_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("1️⃣0️⃣ Stress Indicators (Overall Health)"):
-                                    stress_data = combined.get("10_stress_indicators", {})
-                                    if stress_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Overall Health:</div><div class='feature-value'>{stress_data.get('health_status', stress_data.get('overall_assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if stress_data.get('stress_score') is not None:
-                                            st.markdown(f"<div class='feature-value'>Stress Score: {stress_data.get('stress_score', 0):.2f} (0 = Healthy, 1 = Severe Stress)</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("1️⃣1️⃣ Chlorophyll Index (Advanced)"):
-                                    chlorophyll_data = combined.get("11_chlorophyll_index", {})
-                                    if chlorophyll_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Chlorophyll Status:</div><div class='feature-value'>{chlorophyll_data.get('chlorophyll_status', chlorophyll_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if chlorophyll_data.get('estimated_nitrogen_level'):
-                                            st.markdown(f"<div class='feature-value'>Estimated Nitrogen Level: {chlorophyll_data.get('estimated_nitrogen_level', 'N/A')}</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("1️⃣2️⃣ Leaf pH Proxy (Advanced)"):
-                                    ph_data = combined.get("12_ph_proxy", {})
-                                    if ph_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>pH Estimate:</div><div class='feature-value'>{ph_data.get('ph_estimate', 'N/A')}</div></div>", unsafe_allow_html=True)
-                                        st.markdown(f"<div class='feature-value' style='font-size: 0.85em; color: #757575;'>(Indirect estimation based on visual indicators)</div>", unsafe_allow_html=True)
-                            
-                            st.markdown(
-                                f"<div class='timestamp'>🕒 {result.get('analysis_timestamp', 'N/A')}</div>", unsafe_allow_html=True)
-                            st.markdown("</div>", unsafe_allow_html=True)
-                        else:
-                            # Healthy leaf case
-                            st.markdown("<div class='result-card'>",
-                                        unsafe_allow_html=True)
-                            st.markdown(
-                                "<div class='disease-title'>✅ Healthy Leaf</div>", unsafe_allow_html=True)
-                            st.markdown(
-                                "<div style='color: #4caf50; font-size: 1.1em; margin-bottom: 1em;'>No disease detected in this leaf. The plant appears to be healthy!</div>", unsafe_allow_html=True)
-                            st.markdown(
-                                f"<span class='info-badge'>Status: {result.get('disease_type', 'healthy')}</span>", unsafe_allow_html=True)
-                            st.markdown(
-                                f"<span class='info-badge'>Confidence: {result.get('confidence', 'N/A')}%</span>", unsafe_allow_html=True)
-                            
-                            # Display Comprehensive Feature Analysis for healthy leaves too
-                            feature_analysis = result.get("feature_analysis", {})
-                            if feature_analysis:
-                                st.markdown("<hr style='margin: 2em 0; border: 1px solid #e0e0e0;'>", unsafe_allow_html=True)
-                                st.markdown(
-                                    "<div class='section-title' style='font-size: 1.5em; color: #1565c0;'>📊 Comprehensive Leaf Analysis</div>", unsafe_allow_html=True)
-                                
-                                # Get combined analysis or AI evaluation
-                                combined = feature_analysis.get("combined_analysis", {})
-                                if not combined:
-                                    combined = feature_analysis.get("ai_evaluation", {})
-                                if not combined:
-                                    combined = feature_analysis.get("computer_vision_analysis", {})
-                                
-                                # Overall Health Status (Feature #10)
-                                stress_indicators = combined.get("10_stress_indicators", {})
-                                if stress_indicators:
-                                    health_status = stress_indicators.get("health_status", stress_indicators.get("overall_assessment", "N/A"))
-                                    if "🟢" in str(health_status) or "Healthy" in str(health_status):
-                                        health_class = "health-healthy"
-                                    elif "🟡" in str(health_status) or "Mild" in str(health_status):
-                                        health_class = "health-mild"
-                                    elif "🔴" in str(health_status) or "Severe" in str(health_status):
-                                        health_class = "health-severe"
-                                    else:
-                                        health_class = "health-healthy"
-                                    st.markdown(
-                                        f"<div class='health-status {health_class}'>{health_status}</div>", unsafe_allow_html=True)
-                                
-                                # Create expandable sections for features (same as disease case)
-                                with st.expander("1️⃣ Leaf Color (Most Important)", expanded=True):
-                                    color_data = combined.get("1_leaf_color", {})
-                                    if color_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Color Assessment:</div><div class='feature-value'>{color_data.get('color_status', color_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                        if color_data.get('green_intensity'):
-                                            st.markdown(f"<div class='feature-value'>Green Intensity: {color_data.get('green_intensity', 0):.1f}</div>", unsafe_allow_html=True)
-                                
-                                with st.expander("2️⃣ Color Uniformity"):
-                                    uniformity_data = combined.get("2_color_uniformity", {})
-                                    if uniformity_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Uniformity Status:</div><div class='feature-value'>{uniformity_data.get('uniformity_status', uniformity_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("3️⃣ Leaf Texture"):
-                                    texture_data = combined.get("3_leaf_texture", {})
-                                    if texture_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Texture Status:</div><div class='feature-value'>{texture_data.get('texture_status', texture_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("4️⃣ Spots / Lesions / Discoloration"):
-                                    lesions_data = combined.get("4_spots_lesions_discoloration", {})
-                                    if lesions_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Lesion Status:</div><div class='feature-value'>{lesions_data.get('lesion_status', lesions_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("5️⃣ Leaf Shape & Deformation"):
-                                    shape_data = combined.get("5_leaf_shape_deformation", {})
-                                    if shape_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Shape Status:</div><div class='feature-value'>{shape_data.get('shape_status', shape_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("6️⃣ Leaf Edge (Margin) Condition"):
-                                    edge_data = combined.get("6_leaf_edge_condition", {})
-                                    if edge_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Edge Status:</div><div class='feature-value'>{edge_data.get('edge_status', edge_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("7️⃣ Leaf Size & Area"):
-                                    size_data = combined.get("7_leaf_size_area", {})
-                                    if size_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Size Status:</div><div class='feature-value'>{size_data.get('size_status', size_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("8️⃣ Vein Color & Visibility"):
-                                    vein_data = combined.get("8_vein_color_visibility", {})
-                                    if vein_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Vein Status:</div><div class='feature-value'>{vein_data.get('vein_status', vein_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("9️⃣ Glossiness / Dullness"):
-                                    gloss_data = combined.get("9_glossiness_dullness", {})
-                                    if gloss_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Surface Quality:</div><div class='feature-value'>{gloss_data.get('glossiness_status', gloss_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("1️⃣0️⃣ Stress Indicators (Overall Health)"):
-                                    stress_data = combined.get("10_stress_indicators", {})
-                                    if stress_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Overall Health:</div><div class='feature-value'>{stress_data.get('health_status', stress_data.get('overall_assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("1️⃣1️⃣ Chlorophyll Index (Advanced)"):
-                                    chlorophyll_data = combined.get("11_chlorophyll_index", {})
-                                    if chlorophyll_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>Chlorophyll Status:</div><div class='feature-value'>{chlorophyll_data.get('chlorophyll_status', chlorophyll_data.get('assessment', 'N/A'))}</div></div>", unsafe_allow_html=True)
-                                
-                                with st.expander("1️⃣2️⃣ Leaf pH Proxy (Advanced)"):
-                                    ph_data = combined.get("12_ph_proxy", {})
-                                    if ph_data:
-                                        st.markdown(f"<div class='feature-card'><div class='feature-title'>pH Estimate:</div><div class='feature-value'>{ph_data.get('ph_estimate', 'N/A')}</div></div>", unsafe_allow_html=True)
-                            
-                            st.markdown(
-                                f"<div class='timestamp'>🕒 {result.get('analysis_timestamp', 'N/A')}</div>", unsafe_allow_html=True)
-                            st.markdown("</div>", unsafe_allow_html=True)
-                    else:
-                        st.error(f"API Error: {response.status_code}")
-                        st.write(response.text)
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            # Results are memoized by image content, so re-detecting
+            # the same images skips the network round trip. The call runs
+            # on a worker thread; reruns poll it instead of blocking.
+            st.session_state["detection"] = (
+                file_ids, get_pool().submit(detect_files, uploaded_files, entries), time.monotonic())
+
+        # Only show a detection started for the files currently uploaded
+        detected_ids, future, started = st.session_state.get("detection", (None, None, 0.0))
+        if future is not None and detected_ids == file_ids:
+            if not future.done():
+                # Each poll redraws the status box with the time spent so far
+                images = f"{len(file_ids)} images" if len(file_ids) > 1 else "image"
+                st.status(f"Analyzing {images} and contacting API... "
+                          f"{time.monotonic() - started:.0f} s", state="running")
+                time.sleep(0.2)
+                st.rerun()
+            try:
+                cards = _rendered_results(future)
+                if len(cards) == 1:
+                    st.markdown(cards[0], unsafe_allow_html=True)
+                else:
+                    for tab, card in zip(st.tabs([f.name for f in uploaded_files]), cards):
+                        with tab:
+                            st.markdown(card, unsafe_allow_html=True)
+            except APIError as e:
+                st.error(f"API Error: {e.status_code}")
+                st.write(e.text)
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
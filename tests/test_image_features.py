@@ -0,0 +1,60 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Leaf Disease"))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from image_features import LeafImageAnalyzer, detect_image_format  # noqa: E402
+
+
+def _read(name):
+    with open(os.path.join(ROOT, "Media", name), "rb") as f:
+        return f.read()
+
+
+class AnalyzeBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = LeafImageAnalyzer()
+        leaf = _read("brown-spot-4 (1).jpg")
+        img = cv2.imdecode(np.frombuffer(leaf, np.uint8), cv2.IMREAD_COLOR)
+        ok, png = cv2.imencode(".png", cv2.flip(img, 1))
+        self.assertTrue(ok)
+        self.images = [leaf, png.tobytes(), leaf]
+
+    def test_matches_single_image_results_in_order(self):
+        expected = [self.analyzer.analyze_complete_bytes(b) for b in self.images]
+        self.assertEqual(self.analyzer.analyze_batch(self.images, workers=2), expected)
+        self.assertNotIn("error", expected[0])
+
+    def test_empty_batch(self):
+        self.assertEqual(self.analyzer.analyze_batch([]), [])
+
+    def test_bad_image_reports_error_in_place(self):
+        results = self.analyzer.analyze_batch([b"not an image", self.images[0]])
+        self.assertIn("error", results[0])
+        self.assertNotIn("error", results[1])
+
+
+class DetectImageFormatTest(unittest.TestCase):
+    def test_gif_is_accepted_and_sent_as_jpeg(self):
+        gif = _read("video.gif")
+        self.assertEqual(detect_image_format(gif), "gif")
+        jpeg = LeafImageAnalyzer().to_jpeg_bytes(gif)
+        self.assertEqual(detect_image_format(jpeg), "jpeg")
+
+    def test_unlisted_format_falls_back_to_opencv(self):
+        ok, ppm = cv2.imencode(".ppm", np.zeros((16, 16, 3), np.uint8))
+        self.assertTrue(ok)
+        self.assertEqual(detect_image_format(ppm.tobytes()), "other")
+
+    def test_non_image_is_rejected(self):
+        self.assertIsNone(detect_image_format(b""))
+        self.assertIsNone(detect_image_format(b"not an image" * 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,33 +7,48 @@ This script demonstrates how to send base64 image data directly to the detector.
 
 import json
 import sys,os
-import base64
+import traceback
+from functools import lru_cache
 from pathlib import Path
 
 # Add the Leaf Disease directory to Python path
 sys.path.insert(0, str(Path(__file__).parent / "Leaf Disease"))
 
 try:
-    from main import LeafDiseaseDetector
+    from image_features import decode_base64_image, detect_image_format, normalize_base64
 except ImportError as e:
-    print(f'{{"error": "Could not import LeafDiseaseDetector: {str(e)}"}}')
+    print(f'{{"error": "Could not import image_features: {str(e)}"}}')
     sys.exit(1)
 
 
-def test_with_base64_data(base64_image_string: str):
+@lru_cache(maxsize=1)
+def _get_detector():
+    """
+    Shared LeafDiseaseDetector, created on first use
+
+    The detector module (and the Groq SDK behind it) is imported here rather
+    than at module import, and one instance serves every call instead of
+    re-reading .env and rebuilding the clients per request.
+    """
+    from main import LeafDiseaseDetector
+    return LeafDiseaseDetector()
+
+
+def test_with_base64_data(base64_image_string: str, verbose: bool = False):
     """
     Test disease detection with base64 image data
 
     Args:
         base64_image_string (str): Base64 encoded image data
+        verbose (bool): Pretty-print the full result (off for API calls)
     """
-    import traceback
     try:
-        detector = LeafDiseaseDetector()
+        detector = _get_detector()
         print("Detector initialized, calling analyze_leaf_image_base64...")
         result = detector.analyze_leaf_image_base64(base64_image_string)
         print("Analysis complete")
-        print(json.dumps(result, indent=2))
+        if verbose:
+            print(json.dumps(result, indent=2))
         return result
     except Exception as e:
         print(f'ERROR in test_with_base64_data: {str(e)}')
@@ -43,33 +58,70 @@ def test_with_base64_data(base64_image_string: str):
 
 def convert_image_to_base64_and_test(image_bytes: bytes):
     """
-    Convert image bytes to base64 and test it
+    Test disease detection with image bytes
+
+    Kept for existing callers; the bytes go straight to the detector's
+    bytes path instead of being base64-encoded here and decoded again.
+
+    Args:
+        image_bytes (bytes): Image data in bytes
+    """
+    result = test_with_image_bytes(image_bytes)
+    if result is None:
+        print("ERROR: test_with_image_bytes returned None")
+    return result
+
+
+def test_with_image_bytes(image_bytes: bytes):
+    """
+    Test disease detection with raw image bytes, skipping the base64 round trip
 
     Args:
         image_bytes (bytes): Image data in bytes
     """
-    import traceback
     try:
         if not image_bytes:
             print('{"error": "No image bytes provided"}')
             return None
 
-        base64_string = base64.b64encode(image_bytes).decode('utf-8')
-        print(f"Converted image to base64 ({len(base64_string)} characters)")
-        result = test_with_base64_data(base64_string)
-        if result is None:
-            print("ERROR: test_with_base64_data returned None")
+        detector = _get_detector()
+        print(f"Detector initialized, calling analyze_leaf_image_bytes ({len(image_bytes)} bytes)...")
+        result = detector.analyze_leaf_image_bytes(image_bytes)
+        print("Analysis complete")
         return result
     except Exception as e:
-        print(f'ERROR in convert_image_to_base64_and_test: {str(e)}')
+        print(f'ERROR in test_with_image_bytes: {str(e)}')
+        print(f'Traceback: {traceback.format_exc()}')
+        return None
+
+
+def test_with_image_batch(images: list):
+    """
+    Test disease detection on several images with batched model requests
+
+    Args:
+        images (list): Image data in bytes, one entry per image
+    """
+    try:
+        if not images or not all(images):
+            print('{"error": "No image bytes provided"}')
+            return None
+
+        detector = _get_detector()
+        print(f"Detector initialized, calling analyze_batch_bytes ({len(images)} images)...")
+        results = detector.analyze_batch_bytes(images)
+        print("Batch analysis complete")
+        return results
+    except Exception as e:
+        print(f'ERROR in test_with_image_batch: {str(e)}')
         print(f'Traceback: {traceback.format_exc()}')
         return None
 
 
 def main():
-    """Test with base64 conversion"""
-    image_path = "Media/brown-spot-4 (1).jpg"
-    convert_image_to_base64_and_test(image_path)
+    """Test with a sample image from the Media folder"""
+    image_path = Path(__file__).parent / "Media" / "brown-spot-4 (1).jpg"
+    convert_image_to_base64_and_test(image_path.read_bytes())
 
 
 if __name__ == "__main__":